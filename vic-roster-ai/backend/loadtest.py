@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+HTTP load generator for the roster backend.
+
+Starts `uvicorn main:app` against a throwaway database, seeds synthetic staff
+profiles, then drives a weighted mix of /submit-profile, /profiles,
+/generate-roster and /export-excel at a fixed concurrency. Reports latency
+percentiles, throughput, error and shed (429/503) counts per endpoint plus the
+solver queue metrics from /solver-stats.
+
+Examples:
+    python3 loadtest.py --staff 30 --concurrency 16 --requests 400
+    python3 loadtest.py --workers 4 --env ROSTER_SOLVER_CONCURRENCY=2 --mix submit=5,profiles=5,generate=1
+    python3 loadtest.py --url http://localhost:8000 --no-seed --mix profiles=1
+
+With --url the target's data is real: seeding and the submit/export
+endpoints write to it (exports add rows to the append-only archive), so
+they are refused unless --allow-writes is given.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+ENDPOINTS = ["submit", "profiles", "generate", "export"]
+# Endpoints that persist data on the target: profiles, roster history and archive rows.
+WRITE_ENDPOINTS = ["submit", "export"]
+ROLES = ["RN", "EN", "CNS", "ANUM", "GNP"]
+SHIFT_PREFS = ["AM", "PM", "ND"]
+# The model needs every shift covered daily and caps anyone at 6 shifts per
+# 7 days, so keep synthetic staff at 0.6/0.8 FTE to stay feasible.
+FTES = ["0.6", "0.8"]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load-test the roster backend endpoints.")
+    parser.add_argument("--url", help="Target an already running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="Extra environment for the server, e.g. ROSTER_SOLVER_CONCURRENCY=2 (repeatable)",
+    )
+    parser.add_argument("--staff", type=int, default=24, help="Profiles seeded into the roster cycle")
+    parser.add_argument("--wards", type=int, default=1)
+    parser.add_argument("--cycle", default="loadtest-cycle")
+    parser.add_argument("--no-seed", action="store_true", help="Skip seeding (use existing data)")
+    parser.add_argument(
+        "--allow-writes",
+        action="store_true",
+        help="With --url, allow seeding and the submit/export endpoints to write to the target",
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Total requests to issue")
+    parser.add_argument("--duration", type=float, help="Run for this many seconds instead of --requests")
+    parser.add_argument(
+        "--mix",
+        default="submit=4,profiles=4,generate=2,export=1",
+        help="Relative endpoint weights (submit, profiles, generate, export)",
+    )
+    parser.add_argument("--seed", type=int, default=1, help="RNG seed for a reproducible request sequence")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args()
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    weights = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint '{name}' in --mix; expected one of {ENDPOINTS}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def synthetic_profile(index: int, cycle: str, wards: int) -> Dict:
+    return {
+        "name": f"Loadtest Nurse {index:05d}",
+        "email": f"loadtest{index:05d}@example.test",
+        "role": ROLES[index % len(ROLES)],
+        "fte": FTES[index % len(FTES)],
+        "shiftPref": SHIFT_PREFS[index % len(SHIFT_PREFS)],
+        "maxNDs": "3",
+        "cycle": cycle,
+        "ward": f"Ward {chr(ord('A') + index % wards)}",
+        "rightToDisconnectAck": True,
+    }
+
+
+def request(base_url: str, method: str, path: str, body: Optional[Dict], timeout: float) -> Tuple[int, float]:
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method)
+    if data is not None:
+        req.add_header("Content-Type", "application/json")
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as exc:
+        exc.read()
+        status = exc.code
+    except (urllib.error.URLError, OSError):
+        status = 0
+    return status, time.perf_counter() - started
+
+
+def start_server(args: argparse.Namespace, workdir: str) -> subprocess.Popen:
+    env = dict(os.environ)
+    env["ROSTER_DB_PATH"] = os.path.join(workdir, "roster.db")
+    env["ROSTER_EXPORT_DIR"] = workdir
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    command = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "main:app",
+        "--host",
+        "127.0.0.1",
+        "--port",
+        str(args.port),
+        "--workers",
+        str(args.workers),
+        "--log-level",
+        "warning",
+    ]
+    log = open(os.path.join(workdir, "server.log"), "wb")
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_until_ready(base_url: str, server: Optional[subprocess.Popen], timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise SystemExit("Server exited during startup; see server.log in the work directory")
+        status, _ = request(base_url, "GET", "/cycles", None, 2.0)
+        if status == 200:
+            return
+        time.sleep(0.2)
+    raise SystemExit(f"Server at {base_url} did not become ready within {timeout:.0f}s")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = min(int(round(pct / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[rank]
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[Tuple[int, float]]] = {name: [] for name in ENDPOINTS}
+
+    def add(self, endpoint: str, status: int, elapsed: float) -> None:
+        with self._lock:
+            self.samples[endpoint].append((status, elapsed))
+
+
+class SolverSampler(threading.Thread):
+    """Poll /solver-stats during the run to capture peak queue depth."""
+
+    def __init__(self, base_url: str, interval: float = 0.25):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.interval = interval
+        self.peak_running = 0
+        self.peak_queued = 0
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        while not self._done.wait(self.interval):
+            stats = fetch_solver_stats(self.base_url)
+            if stats:
+                self.peak_running = max(self.peak_running, stats.get("running", 0))
+                self.peak_queued = max(self.peak_queued, stats.get("queued", 0))
+
+    def stop(self) -> None:
+        self._done.set()
+        self.join()
+
+
+def fetch_solver_stats(base_url: str) -> Optional[Dict]:
+    try:
+        with urllib.request.urlopen(base_url + "/solver-stats", timeout=5) as response:
+            return json.loads(response.read())
+    except (urllib.error.URLError, OSError, ValueError):
+        return None
+
+
+def run_load(args: argparse.Namespace, base_url: str) -> Tuple[Recorder, float]:
+    weights = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    names = list(weights)
+    plan_size = args.requests if args.duration is None else 1_000_000
+    plan = rng.choices(names, weights=[weights[name] for name in names], k=plan_size)
+
+    recorder = Recorder()
+    submit_counter = iter(range(100_000, 10_000_000))
+    counter_lock = threading.Lock()
+    submit_cycle = f"{args.cycle}-submissions"
+    deadline = time.monotonic() + args.duration if args.duration is not None else None
+    roster_query = f"?cycle={urllib.parse.quote(args.cycle)}"
+
+    def issue(endpoint: str) -> None:
+        if deadline is not None and time.monotonic() >= deadline:
+            return
+        if endpoint == "submit":
+            with counter_lock:
+                index = next(submit_counter)
+            # Submissions go to a separate cycle so they do not invalidate the
+            # roster being generated; the write path is what is under test.
+            body = synthetic_profile(index, submit_cycle, args.wards)
+            status, elapsed = request(base_url, "POST", "/submit-profile", body, args.timeout)
+        elif endpoint == "profiles":
+            status, elapsed = request(base_url, "GET", "/profiles" + roster_query, None, args.timeout)
+        elif endpoint == "generate":
+            status, elapsed = request(base_url, "GET", "/generate-roster" + roster_query, None, args.timeout)
+        else:
+            status, elapsed = request(base_url, "GET", "/export-excel" + roster_query, None, args.timeout)
+        recorder.add(endpoint, status, elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        if deadline is None:
+            list(pool.map(issue, plan))
+        else:
+            position = 0
+            while time.monotonic() < deadline:
+                batch = plan[position : position + args.concurrency * 4]
+                position += len(batch)
+                list(pool.map(issue, batch))
+    return recorder, time.perf_counter() - started
+
+
+def build_report(
+    recorder: Recorder, wall: float, sampler: SolverSampler, solver: Optional[Dict], workers: int
+) -> Dict:
+    endpoints = {}
+    total = 0
+    for endpoint, samples in recorder.samples.items():
+        if not samples:
+            continue
+        total += len(samples)
+        latencies = sorted(elapsed for _, elapsed in samples)
+        ok = sum(1 for status, _ in samples if 200 <= status < 300)
+        shed = sum(1 for status, _ in samples if status in (429, 503))
+        endpoints[endpoint] = {
+            "requests": len(samples),
+            "ok": ok,
+            "shed": shed,
+            "errors": len(samples) - ok - shed,
+            "errorRate": round((len(samples) - ok) / len(samples), 4),
+            "p50Ms": round(percentile(latencies, 50) * 1000, 1),
+            "p90Ms": round(percentile(latencies, 90) * 1000, 1),
+            "p99Ms": round(percentile(latencies, 99) * 1000, 1),
+            "maxMs": round(latencies[-1] * 1000, 1),
+            "throughputRps": round(len(samples) / wall, 1) if wall else 0.0,
+        }
+    return {
+        "workers": workers,
+        "wallSeconds": round(wall, 2),
+        "requests": total,
+        "throughputRps": round(total / wall, 1) if wall else 0.0,
+        "endpoints": endpoints,
+        "solver": {
+            "peakRunning": sampler.peak_running,
+            "peakQueued": sampler.peak_queued,
+            "final": solver,
+        },
+    }
+
+
+def print_report(report: Dict) -> None:
+    print("=" * 78)
+    print(f"LOAD TEST: {report['requests']} requests in {report['wallSeconds']}s ({report['throughputRps']} req/s)")
+    print("=" * 78)
+    print(f"{'endpoint':<10}{'reqs':>7}{'ok':>7}{'shed':>6}{'err':>6}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'rps':>8}")
+    for endpoint, row in report["endpoints"].items():
+        print(
+            f"{endpoint:<10}{row['requests']:>7}{row['ok']:>7}{row['shed']:>6}{row['errors']:>6}"
+            f"{row['p50Ms']:>10}{row['p90Ms']:>10}{row['p99Ms']:>10}{row['maxMs']:>10}{row['throughputRps']:>8}"
+        )
+    solver = report["solver"]
+    print("-" * 78)
+    print(f"Solver peak running: {solver['peakRunning']}  peak queued: {solver['peakQueued']}")
+    final = solver["final"]
+    if final:
+        print(
+            f"Solver admitted: {final.get('admitted')}  rejected (queue full/timeout): "
+            f"{final.get('rejectedQueueFull')}/{final.get('rejectedTimeout')}  "
+            f"avg wait: {final.get('avgWaitSeconds')}s  max wait: {final.get('maxWaitSeconds')}s"
+        )
+        cache = final.get("resultCache")
+        if cache:
+            print(f"Result cache hits/misses: {cache.get('hits')}/{cache.get('misses')}")
+        if report["workers"] > 1:
+            print("(solver stats come from whichever worker answered /solver-stats)")
+
+
+def check_target_writes(args: argparse.Namespace) -> None:
+    """Refuse to write to an existing server unless asked to; its archive cannot be cleaned up afterwards."""
+    if not args.url or args.allow_writes:
+        return
+    writes = [name for name, weight in parse_mix(args.mix).items() if name in WRITE_ENDPOINTS and weight > 0]
+    if not args.no_seed:
+        writes.insert(0, "seeding")
+    if writes:
+        raise SystemExit(
+            f"--url targets a live server and {', '.join(writes)} would write to it; "
+            "use --no-seed and a read-only --mix (profiles, generate), or pass --allow-writes"
+        )
+
+
+def main() -> int:
+    args = parse_args()
+    check_target_writes(args)
+    workdir = None
+    server = None
+    base_url = args.url.rstrip("/") if args.url else f"http://127.0.0.1:{args.port}"
+    try:
+        if not args.url:
+            workdir = tempfile.mkdtemp(prefix="roster-loadtest-")
+            server = start_server(args, workdir)
+        wait_until_ready(base_url, server)
+
+        if not args.no_seed:
+            for index in range(args.staff):
+                status, _ = request(base_url, "POST", "/submit-profile", synthetic_profile(index, args.cycle, args.wards), 30)
+                if status not in (200, 400):
+                    raise SystemExit(f"Seeding failed with HTTP {status}")
+
+        sampler = SolverSampler(base_url)
+        sampler.start()
+        recorder, wall = run_load(args, base_url)
+        sampler.stop()
+
+        report = build_report(recorder, wall, sampler, fetch_solver_stats(base_url), args.workers)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print_report(report)
+        return 0
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
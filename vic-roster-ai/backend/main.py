@@ -1,22 +1,139 @@
+from array import array
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar, copy_context
+import csv
 from datetime import datetime
+import hashlib
+import hmac
+import io
+import json
+import math
 import os
+import queue
+import secrets
+import shutil
+import signal
 import sqlite3
-from typing import Dict, List, Tuple
-
-from fastapi import FastAPI, HTTPException
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from openpyxl import Workbook
 from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
-from pulp import LpBinary, LpMinimize, LpProblem, LpVariable, lpSum, value
+from pulp import (
+    PULP_CBC_CMD,
+    LpBinary,
+    LpMinimize,
+    LpProblem,
+    LpSolutionOptimal,
+    LpStatusInfeasible,
+    LpStatusNotSolved,
+    LpStatusOptimal,
+    LpVariable,
+    lpSum,
+    value,
+)
 from pydantic import BaseModel
 
+try:  # POSIX only; without it workers may occasionally duplicate a solve.
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:  # Parquet export is optional; CSV works without pyarrow.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
 DB_FILENAME = "roster.db"
 EXPORT_FILENAME = "Roster_Request.xlsx"
+BATCH_EXPORT_FILENAME = "Roster_Request_All_Wards.xlsx"
 
 BASE_DIR = os.path.dirname(__file__)
-DB_PATH = os.path.join(BASE_DIR, DB_FILENAME)
-EXPORT_PATH = os.path.join(BASE_DIR, EXPORT_FILENAME)
+DB_PATH = os.environ.get("ROSTER_DB_PATH") or os.path.join(BASE_DIR, DB_FILENAME)
+DATA_DIR = os.path.dirname(os.path.abspath(DB_PATH))
+SOLVE_LOCK_DIR = os.path.join(DATA_DIR, "solve_locks")
+EXPORT_DIR = os.environ.get("ROSTER_EXPORT_DIR") or BASE_DIR
+EXPORT_PATH = os.path.join(EXPORT_DIR, EXPORT_FILENAME)
+ARCHIVE_PATH = os.environ.get("ROSTER_ARCHIVE_PATH") or os.path.join(DATA_DIR, "roster_archive.db")
+
+# Solver portfolio: how many CBC configurations race per solve (1 = single
+# solve). Each race keeps that many CBC processes busy at once.
+PORTFOLIO_SIZE = max(int(os.environ.get("ROSTER_PORTFOLIO_SIZE", "1")), 1)
+# Admission control for the solver tier: at most SOLVER_CONCURRENCY solves run
+# at once, at most SOLVER_QUEUE_LIMIT wait behind them, and a waiter gives up
+# after SOLVER_QUEUE_TIMEOUT seconds. The default shares the cores between
+# portfolio races so concurrency times portfolio size stays within them.
+SOLVER_CONCURRENCY = max(
+    int(os.environ.get("ROSTER_SOLVER_CONCURRENCY", (os.cpu_count() or 1) // PORTFOLIO_SIZE)), 1
+)
+SOLVER_QUEUE_LIMIT = max(int(os.environ.get("ROSTER_SOLVER_QUEUE_LIMIT", "8")), 0)
+SOLVER_QUEUE_TIMEOUT = float(os.environ.get("ROSTER_SOLVER_QUEUE_TIMEOUT", "30"))
+# Solved rosters kept in memory, keyed by input fingerprint. A provisional
+# solve (cut short by a time limit) is only kept this many seconds, and never
+# shared or persisted, so a later attempt can still do better.
+RESULT_CACHE_SIZE = max(int(os.environ.get("ROSTER_RESULT_CACHE_SIZE", "32")), 1)
+PROVISIONAL_RESULT_TTL = 60
+# Solved rosters and rendered exports shared by all worker processes through
+# the SQLite database; the oldest entries beyond this count are pruned.
+SHARED_CACHE_SIZE = max(int(os.environ.get("ROSTER_SHARED_CACHE_SIZE", "256")), 1)
+SOLVE_LOCK_POLL_SECONDS = 0.05
+# Seconds of quiet after a submission before the roster is re-solved in the
+# background; a negative value disables speculative pre-solving.
+PRESOLVE_DELAY = float(os.environ.get("ROSTER_PRESOLVE_DELAY", "2"))
+# Submissions arriving within this many milliseconds share one commit.
+WRITE_BATCH_WINDOW_MS = float(os.environ.get("ROSTER_WRITE_BATCH_MS", "5"))
+WRITE_BATCH_MAX = 256
+# Change feed: rows per query, and how often an idle stream re-checks the
+# database for writes made by other worker processes.
+CHANGE_FEED_PAGE = 500
+CHANGE_FEED_POLL_SECONDS = float(os.environ.get("ROSTER_CHANGE_FEED_POLL", "5"))
+# Persistent per-scope solver models reused across re-solves.
+MODEL_SESSION_LIMIT = max(int(os.environ.get("ROSTER_MODEL_SESSIONS", "16")), 1)
+# Roster objective: "weighted" (one solve over OBJECTIVE_WEIGHTS),
+# "lexicographic" (one time-boxed stage per term in OBJECTIVE_TERMS order) or
+# "preference" (off-preference shifts only). STAGE_SECONDS caps each solve;
+# weights are overridden as ROSTER_OBJECTIVE_WEIGHTS="weekend=5,nights=2".
+OBJECTIVE_MODE = os.environ.get("ROSTER_OBJECTIVE", "weighted").strip().lower()
+if OBJECTIVE_MODE not in ("weighted", "lexicographic", "preference"):
+    raise ValueError(f"ROSTER_OBJECTIVE must be weighted, lexicographic or preference, got {OBJECTIVE_MODE!r}")
+OBJECTIVE_TERMS = ["preference", "fatigue", "weekend", "nights"]
+OBJECTIVE_WEIGHTS = {"preference": 1.0, "fatigue": 4.0, "weekend": 3.0, "nights": 3.0}
+OBJECTIVE_WEIGHTS.update(
+    (term.strip(), float(weight))
+    for term, _, weight in (
+        item.partition("=") for item in os.environ.get("ROSTER_OBJECTIVE_WEIGHTS", "").split(",") if item.strip()
+    )
+)
+if set(OBJECTIVE_WEIGHTS) != set(OBJECTIVE_TERMS):
+    raise ValueError(f"ROSTER_OBJECTIVE_WEIGHTS terms must be among {', '.join(OBJECTIVE_TERMS)}")
+STAGE_SECONDS = max(float(os.environ.get("ROSTER_STAGE_SECONDS", "10")), 1.0)
+# Solver portfolio: the deadline after which the best incumbent is taken
+# (PORTFOLIO_SIZE, the number of configurations raced, is set above).
+PORTFOLIO_DEADLINE = max(float(os.environ.get("ROSTER_PORTFOLIO_DEADLINE", "30")), 1.0)
+PORTFOLIO_GRACE_SECONDS = 5
+PORTFOLIO_POLL_SECONDS = 0.01
+# On-demand request profiling; disabled unless an admin token is configured.
+ADMIN_TOKEN = os.environ.get("ROSTER_ADMIN_TOKEN", "")
+TRACE_DIR = os.path.join(DATA_DIR, "traces")
+TRACE_INTERVAL_MS = max(float(os.environ.get("ROSTER_TRACE_INTERVAL_MS", "5")), 0.5)
+TRACE_KEEP = 50
+TRACE_TOP_ALLOCATIONS = 10
 
 DAYS = 14
 SHIFTS = ["AM", "PM", "ND"]
@@ -24,8 +141,17 @@ SHIFT_CODE_MAP = {"AM": "D", "PM": "E", "ND": "N"}
 SHIFT_BANNED_PAIRS = {("E", "D"), ("N", "D"), ("N", "E"), ("D", "N")}
 ROLE_ORDER = ["ANUM", "CNS", "RN", "EN", "GNP"]
 WEEKEND_INDEXES = {5, 6, 12, 13}
+# Roster history packs each day into two bits, indexed by these codes. The
+# solver and analytics carry this many days over from the previous cycle,
+# enough to cover a seven-day window that starts before day 1.
+HISTORY_CODES = ["OFF", "D", "E", "N"]
+CONTINUITY_DAYS = 6
 DEFAULT_REQUESTS = 2
 DEFAULT_PREFERENCES = 2
+DEFAULT_WARD = "Ward A"
+# Availability kinds and the Profile field each is parsed from. Every kind
+# blocks the day for that person in the solver.
+AVAILABILITY_FIELDS = {"hard": "hardLock", "soft": "softLock", "leave": "leaveDays"}
 BOOLEAN_FIELDS = [
     "flexibleWork",
     "swapWilling",
@@ -33,6 +159,38 @@ BOOLEAN_FIELDS = [
     "rightToDisconnectAck",
     "localInductionComplete",
 ]
+# Profile fields that influence the solved roster or its analytics; the
+# fingerprint of these decides whether two requests can share one solve.
+SOLVER_INPUT_FIELDS = [
+    "name",
+    "role",
+    "fte",
+    "shiftPref",
+    "maxNDs",
+    "softLock",
+    "hardLock",
+    "leaveDays",
+    "flexibleWork",
+    "swapWilling",
+    "overtimeOptIn",
+    "cycle",
+    "ward",
+    "previousShifts",
+]
+ROSTER_EXPORT_COLUMNS = ["ward", "role", "name", "email", "cycle"] + [f"day{d + 1}" for d in range(DAYS)]
+COMPLIANCE_EXPORT_COLUMNS = [
+    "name",
+    "role",
+    "fte",
+    "weekendCount",
+    "maxConsecutive",
+    "longestOffStreak",
+    "hasTwoDayBreak",
+    "restBreaches",
+    "fatigueScore",
+    "compliant",
+    "notes",
+]
 
 app = FastAPI()
 app.add_middleware(
@@ -40,6 +198,7 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Change-Seq"],
 )
 
 
@@ -52,6 +211,7 @@ class Profile(BaseModel):
     maxNDs: str
     softLock: str = ""
     hardLock: str = ""
+    leaveDays: str = ""
     cycle: str
     requestsQuota: int = DEFAULT_REQUESTS
     preferencesQuota: int = DEFAULT_PREFERENCES
@@ -62,17 +222,19 @@ class Profile(BaseModel):
     rightToDisconnectAck: bool = False
     localInductionComplete: bool = False
     supplementaryAvailability: str = ""
+    ward: str = DEFAULT_WARD
 
 
 conn = sqlite3.connect(DB_PATH, check_same_thread=False)
 conn.row_factory = sqlite3.Row
+# WAL lets readers proceed while the profile writer thread holds a write transaction.
+conn.execute("PRAGMA journal_mode=WAL")
 
-conn.execute(
-    """
-CREATE TABLE IF NOT EXISTS profiles (
+PROFILES_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS {table} (
     id INTEGER PRIMARY KEY,
     name TEXT,
-    email TEXT UNIQUE,
+    email TEXT,
     role TEXT DEFAULT 'RN',
     fte TEXT,
     shiftPref TEXT,
@@ -89,10 +251,14 @@ CREATE TABLE IF NOT EXISTS profiles (
     right_to_disconnect_ack INTEGER DEFAULT 0,
     local_induction_complete INTEGER DEFAULT 0,
     supplementary_availability TEXT DEFAULT '',
-    submitted_at TEXT
+    ward TEXT DEFAULT 'Ward A',
+    leave_days TEXT DEFAULT '',
+    submitted_at TEXT,
+    UNIQUE (email, cycle)
 )
 """
-)
+
+conn.execute(PROFILES_TABLE_SQL.format(table="profiles"))
 
 for column, dtype, default in [
     ("role", "TEXT", "'RN'"),
@@ -105,11 +271,69 @@ for column, dtype, default in [
     ("right_to_disconnect_ack", "INTEGER", "0"),
     ("local_induction_complete", "INTEGER", "0"),
     ("supplementary_availability", "TEXT", "''"),
+    ("ward", "TEXT", "'Ward A'"),
+    ("leave_days", "TEXT", "''"),
 ]:
     try:
         conn.execute(f"ALTER TABLE profiles ADD COLUMN {column} {dtype} DEFAULT {default}")
     except sqlite3.OperationalError:
         pass
+
+
+def _has_email_only_unique(connection: sqlite3.Connection) -> bool:
+    for index in connection.execute("PRAGMA index_list(profiles)").fetchall():
+        if not index["unique"]:
+            continue
+        columns = [col["name"] for col in connection.execute(f"PRAGMA index_info('{index['name']}')").fetchall()]
+        if columns == ["email"]:
+            return True
+    return False
+
+
+# Databases created before per-cycle submissions had `email UNIQUE`; SQLite
+# cannot drop a constraint in place, so rebuild the table keyed by (email, cycle).
+if _has_email_only_unique(conn):
+    columns = ", ".join(col["name"] for col in conn.execute("PRAGMA table_info(profiles)").fetchall())
+    with conn:
+        conn.execute("ALTER TABLE profiles RENAME TO profiles_legacy")
+        conn.execute(PROFILES_TABLE_SQL.format(table="profiles"))
+        conn.execute(f"INSERT INTO profiles ({columns}) SELECT {columns} FROM profiles_legacy")
+        conn.execute("DROP TABLE profiles_legacy")
+
+conn.execute("CREATE INDEX IF NOT EXISTS idx_profiles_cycle_ward ON profiles (cycle, ward)")
+conn.execute("CREATE INDEX IF NOT EXISTS idx_profiles_role ON profiles (role)")
+conn.execute("CREATE INDEX IF NOT EXISTS idx_profiles_submitted_at ON profiles (submitted_at)")
+conn.commit()
+
+# Append-only log of profile writes; clients resume the change feed from a seq.
+conn.execute(
+    """
+CREATE TABLE IF NOT EXISTS profile_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    profile_id INTEGER NOT NULL,
+    op TEXT NOT NULL,
+    cycle TEXT,
+    ward TEXT,
+    changed_at TEXT NOT NULL
+)
+"""
+)
+conn.commit()
+
+# Lock and leave days parsed once at submit time: one row per (profile, day, kind).
+_availability_is_new = (
+    conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'availability'").fetchone() is None
+)
+conn.execute(
+    """
+CREATE TABLE IF NOT EXISTS availability (
+    profile_id INTEGER NOT NULL REFERENCES profiles (id) ON DELETE CASCADE,
+    day INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    PRIMARY KEY (profile_id, day, kind)
+) WITHOUT ROWID
+"""
+)
 conn.commit()
 
 
@@ -175,6 +399,28 @@ def validate_lock_format(value: str) -> Tuple[bool, str, int]:
         return False, "Lock day must be numeric (e.g., '15 Nov')", -1
 
 
+def parse_lock_days(value: str) -> Tuple[bool, str, List[int]]:
+    """Parse a comma/semicolon separated list of 'DD MMM' entries into day numbers."""
+    days: List[int] = []
+    for entry in value.replace(";", ",").split(","):
+        if not entry.strip():
+            continue
+        valid, error_msg, day = validate_lock_format(entry)
+        if not valid:
+            return False, error_msg, []
+        if day not in days:
+            days.append(day)
+    return True, "", sorted(days)
+
+
+def _availability_rows(profile_id: int, values: Dict[str, str]) -> List[Tuple[int, int, str]]:
+    rows = []
+    for kind, field in AVAILABILITY_FIELDS.items():
+        _, _, days = parse_lock_days(values.get(field) or "")
+        rows.extend((profile_id, day, kind) for day in days)
+    return rows
+
+
 def validate_name(value: str) -> Tuple[bool, str]:
     """Validate name is not empty."""
     if not value or not value.strip():
@@ -182,6 +428,15 @@ def validate_name(value: str) -> Tuple[bool, str]:
     return True, ""
 
 
+def validate_ward(value: str) -> Tuple[bool, str]:
+    """Validate ward is not empty and fits an Excel sheet title."""
+    if not value or not value.strip():
+        return False, "Ward is required"
+    if len(value.strip()) > 31 or any(ch in value for ch in "[]:*?/\\"):
+        return False, "Ward must be at most 31 characters and not contain []:*?/\\"
+    return True, ""
+
+
 def validate_email(value: str) -> Tuple[bool, str]:
     """Validate email format."""
     if not value or "@" not in value:
@@ -191,18 +446,651 @@ def validate_email(value: str) -> Tuple[bool, str]:
     return True, ""
 
 
-def fetch_profiles() -> List[Dict]:
+if _availability_is_new:
+    # Backfill from the lock strings of profiles submitted before the table existed.
+    for row in conn.execute("SELECT id, softLock, hardLock, leave_days FROM profiles").fetchall():
+        legacy = {"softLock": row["softLock"], "hardLock": row["hardLock"], "leaveDays": row["leave_days"]}
+        conn.executemany(
+            "INSERT OR IGNORE INTO availability (profile_id, day, kind) VALUES (?, ?, ?)",
+            _availability_rows(row["id"], legacy),
+        )
+    conn.commit()
+
+
+PROFILE_WRITE_COLUMNS = [
+    "name",
+    "email",
+    "role",
+    "fte",
+    "shiftPref",
+    "maxNDs",
+    "softLock",
+    "hardLock",
+    "cycle",
+    "requests_quota",
+    "preferences_quota",
+    "flexible_work",
+    "swap_willing",
+    "overtime_opt_in",
+    "availability_notes",
+    "right_to_disconnect_ack",
+    "local_induction_complete",
+    "supplementary_availability",
+    "ward",
+    "leave_days",
+]
+PROFILE_INSERT_SQL = (
+    f"INSERT INTO profiles ({', '.join(PROFILE_WRITE_COLUMNS)}, submitted_at) "
+    f"VALUES ({', '.join('?' for _ in PROFILE_WRITE_COLUMNS)}, ?)"
+)
+# Edits keep the original submitted_at: it orders cycles for latest_cycle().
+PROFILE_UPDATE_SQL = f"UPDATE profiles SET {', '.join(f'{col} = ?' for col in PROFILE_WRITE_COLUMNS)} WHERE id = ?"
+
+
+def _profile_params(profile: "Profile") -> Tuple:
+    return (
+        profile.name.strip(),
+        profile.email.strip(),
+        profile.role.upper(),
+        profile.fte,
+        profile.shiftPref,
+        profile.maxNDs,
+        profile.softLock,
+        profile.hardLock,
+        profile.cycle,
+        profile.requestsQuota,
+        profile.preferencesQuota,
+        _bool_to_int(profile.flexibleWork),
+        _bool_to_int(profile.swapWilling),
+        _bool_to_int(profile.overtimeOptIn),
+        profile.availabilityNotes,
+        _bool_to_int(profile.rightToDisconnectAck),
+        _bool_to_int(profile.localInductionComplete),
+        profile.supplementaryAvailability,
+        profile.ward.strip(),
+        profile.leaveDays,
+    )
+
+
+class ChangeFeed:
+    """Wake change-feed subscribers on any event loop when new writes commit."""
+
+    def __init__(self, latest: int):
+        self.latest = latest
+        self._lock = threading.Lock()
+        self._waiters = set()
+
+    def publish(self, seq: int) -> None:
+        with self._lock:
+            self.latest = max(self.latest, seq)
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    async def wait(self, after: int, timeout: float) -> bool:
+        """Return True once a change newer than ``after`` is known, False on timeout."""
+        token = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            if self.latest > after:
+                return True
+            self._waiters.add(token)
+        try:
+            await asyncio.wait_for(token[1].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._waiters.discard(token)
+
+
+_change_feed = ChangeFeed(conn.execute("SELECT COALESCE(MAX(seq), 0) FROM profile_changes").fetchone()[0])
+
+
+class ProfileWriter:
+    """Single writer thread that group-commits profile inserts, updates and deletes.
+
+    Callers enqueue an operation and get a Future for its outcome. The thread
+    drains whatever arrives within ``window`` seconds of the first item and
+    commits the batch once; each operation runs under its own savepoint so a
+    duplicate submission fails alone without aborting its neighbours. Every
+    applied operation appends to ``profile_changes`` in the same transaction.
+    """
+
+    def __init__(self, db_path: str, window: float, max_batch: int):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Optional[Tuple[str, Optional[int], Optional[Profile], Future]]]" = queue.Queue()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA busy_timeout = 5000")
+        self.batches = 0
+        self.writes = 0
+        self._thread = threading.Thread(target=self._run, name="profile-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, op: str, profile_id: Optional[int], profile: Optional["Profile"]) -> Future:
+        future: Future = Future()
+        self._queue.put((op, profile_id, profile, future))
+        return future
+
+    async def insert(self, profile: "Profile") -> Dict:
+        return await asyncio.wrap_future(self.submit("insert", None, profile))
+
+    async def update(self, profile_id: int, profile: "Profile") -> Dict:
+        return await asyncio.wrap_future(self.submit("update", profile_id, profile))
+
+    async def delete(self, profile_id: int) -> Dict:
+        return await asyncio.wrap_future(self.submit("delete", profile_id, None))
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+        self._conn.close()
+
+    def _collect(self, first) -> Tuple[List, bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _apply(self, op: str, profile_id: Optional[int], profile: Optional["Profile"]) -> Dict:
+        previous = None
+        if op != "insert":
+            row = self._conn.execute("SELECT cycle, ward FROM profiles WHERE id = ?", (profile_id,)).fetchone()
+            if row is None:
+                raise KeyError(profile_id)
+            previous = (row[0], row[1])
+            self._conn.execute("DELETE FROM availability WHERE profile_id = ?", (profile_id,))
+
+        if op == "insert":
+            profile_id = self._conn.execute(
+                PROFILE_INSERT_SQL, _profile_params(profile) + (datetime.now().isoformat(),)
+            ).lastrowid
+        elif op == "update":
+            self._conn.execute(PROFILE_UPDATE_SQL, _profile_params(profile) + (profile_id,))
+        else:
+            self._conn.execute("DELETE FROM profiles WHERE id = ?", (profile_id,))
+
+        scope = (profile.cycle, profile.ward.strip()) if profile is not None else previous
+        if profile is not None:
+            self._conn.executemany(
+                "INSERT INTO availability (profile_id, day, kind) VALUES (?, ?, ?)",
+                _availability_rows(profile_id, profile.model_dump()),
+            )
+        seq = self._conn.execute(
+            "INSERT INTO profile_changes (profile_id, op, cycle, ward, changed_at) VALUES (?, ?, ?, ?, ?)",
+            (profile_id, op, scope[0], scope[1], datetime.now().isoformat()),
+        ).lastrowid
+        return {"id": profile_id, "seq": seq, "scope": scope, "previousScope": previous}
+
+    def _write(self, batch: List) -> None:
+        outcomes: List[Tuple[Future, object, Optional[BaseException]]] = []
+        try:
+            self._conn.execute("BEGIN IMMEDIATE")
+            for op, profile_id, profile, future in batch:
+                self._conn.execute("SAVEPOINT submission")
+                try:
+                    outcome = self._apply(op, profile_id, profile)
+                    self._conn.execute("RELEASE submission")
+                    outcomes.append((future, outcome, None))
+                except Exception as exc:
+                    self._conn.execute("ROLLBACK TO submission")
+                    self._conn.execute("RELEASE submission")
+                    outcomes.append((future, None, exc))
+            self._conn.execute("COMMIT")
+        except Exception as exc:
+            outcomes = [(future, None, exc) for *_, future in batch]
+            if self._conn.in_transaction:
+                try:
+                    self._conn.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+        finally:
+            # Whatever happened, no caller may be left awaiting its Future.
+            self.batches += 1
+            self.writes += len(batch)
+            committed = [result["seq"] for _, result, error in outcomes if error is None]
+            if committed:
+                _change_feed.publish(max(committed))
+            for future, result, error in outcomes:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Profile write was not applied"))
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, closing = self._collect(first)
+            self._write(batch)
+            if closing:
+                return
+
+
+_profile_writer = ProfileWriter(DB_PATH, WRITE_BATCH_WINDOW_MS / 1000, WRITE_BATCH_MAX)
+
+
+@app.on_event("shutdown")
+def _close_profile_writer():
+    _profile_writer.close()
+
+
+def _pack_shifts(codes: List[str]) -> int:
+    """Pack day codes into an int, two bits per day with day 1 in the lowest bits."""
+    packed = 0
+    for day, code in enumerate(codes):
+        packed |= HISTORY_CODES.index(code) << (2 * day)
+    return packed
+
+
+def _unpack_shifts(packed: int, days: int = DAYS) -> List[str]:
+    return [HISTORY_CODES[(packed >> (2 * day)) & 0b11] for day in range(days)]
+
+
+class RosterHistory:
+    """Published rosters, one bit-packed fortnight per (cycle, email), tagged with the ward.
+
+    Cycles are ordered by when they were first published, so the roster that
+    precedes a cycle is the last one published before it. Only the tail of
+    that roster is needed to carry runs and turnarounds across the boundary.
+    """
+
+    def __init__(self, db_path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA busy_timeout = 5000")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS roster_history_cycles (
+                cycle TEXT PRIMARY KEY,
+                first_published_at TEXT NOT NULL,
+                published_at TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS roster_history (
+                cycle TEXT NOT NULL,
+                email TEXT NOT NULL,
+                shifts INTEGER NOT NULL,
+                ward TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (cycle, email)
+            ) WITHOUT ROWID
+            """
+        )
+        try:
+            self._conn.execute("ALTER TABLE roster_history ADD COLUMN ward TEXT NOT NULL DEFAULT ''")
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_roster_history_cycles_first ON roster_history_cycles (first_published_at)"
+        )
+
+    def previous_cycle(self, cycle: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT cycle FROM roster_history_cycles
+                WHERE cycle != ?1 AND first_published_at < COALESCE(
+                    (SELECT first_published_at FROM roster_history_cycles WHERE cycle = ?1), '9999'
+                )
+                ORDER BY first_published_at DESC
+                LIMIT 1
+                """,
+                (cycle,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def tails(self, cycles, days: int = CONTINUITY_DAYS) -> Dict[Tuple[str, str], List[str]]:
+        """Map (cycle, email) to the last ``days`` codes each person worked in the preceding cycle."""
+        tails = {}
+        for cycle in cycles:
+            previous = self.previous_cycle(cycle)
+            if previous is None:
+                continue
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT email, shifts FROM roster_history WHERE cycle = ?", (previous,)
+                ).fetchall()
+            for email, packed in rows:
+                tails[(cycle, email)] = _unpack_shifts(packed)[-days:]
+        return tails
+
+    def record(self, cycle: str, rows: List[Tuple[str, str, List[str]]]) -> None:
+        """Store (email, ward, day codes) for a published roster.
+
+        The rows replace everything previously published for the same cycle
+        and wards, so staff withdrawn since then leave no stale tail behind.
+        """
+        now = datetime.now().isoformat()
+        wards = sorted({ward for _, ward, _ in rows})
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    """
+                    INSERT INTO roster_history_cycles (cycle, first_published_at, published_at) VALUES (?, ?, ?)
+                    ON CONFLICT (cycle) DO UPDATE SET published_at = excluded.published_at
+                    """,
+                    (cycle, now, now),
+                )
+                self._conn.execute(
+                    f"DELETE FROM roster_history WHERE cycle = ? AND ward IN ({', '.join('?' for _ in wards)})",
+                    [cycle, *wards],
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO roster_history (cycle, email, shifts, ward) VALUES (?, ?, ?, ?)",
+                    [(cycle, email, _pack_shifts(codes), ward) for email, ward, codes in rows],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+_roster_history = RosterHistory(DB_PATH)
+
+
+class RosterArchive:
+    """Append-only, compressed archive of published rosters for the seven-year retention period.
+
+    Each publication keeps its roster and compliance analytics as one
+    zlib-compressed JSON blob. Alongside it every staff member's fortnight is
+    indexed as a bit-packed row keyed by (email, year, publication), so
+    per-person history is a primary-key range scan that never inflates a blob.
+    Triggers reject updates and deletes.
+    """
+
+    TABLES = ("publications", "archived_shifts", "archived_workbooks")
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout = 5000")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS publications (
+                id INTEGER PRIMARY KEY,
+                fingerprint TEXT NOT NULL UNIQUE,
+                cycle TEXT NOT NULL,
+                ward TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                published_at TEXT NOT NULL,
+                staff INTEGER NOT NULL,
+                payload BLOB NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_publications_cycle_ward ON publications (cycle, ward)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_publications_year ON publications (year)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS archived_shifts (
+                email TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                publication_id INTEGER NOT NULL REFERENCES publications (id),
+                name TEXT NOT NULL,
+                shifts INTEGER NOT NULL,
+                PRIMARY KEY (email, year, publication_id)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS archived_workbooks (
+                publication_id INTEGER PRIMARY KEY REFERENCES publications (id),
+                body BLOB NOT NULL
+            )
+            """
+        )
+        for table in self.TABLES:
+            for event in ("UPDATE", "DELETE"):
+                self._conn.execute(
+                    f"""
+                    CREATE TRIGGER IF NOT EXISTS {table}_no_{event.lower()}
+                    BEFORE {event} ON {table}
+                    BEGIN SELECT RAISE(ABORT, 'roster archive is append-only'); END
+                    """
+                )
+
+    def record(self, staff: "StaffTable", data: Dict, codes: List[List[str]]) -> None:
+        """Archive a published roster once per input fingerprint; ``codes`` are its per-row day codes."""
+        key = staff.key
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM publications WHERE fingerprint = ?", (key,)).fetchone():
+                return
+        published = datetime.now()
+        payload = {
+            "staff": [
+                {field: profile[field] for field in ("name", "email", "role", "fte", "ward", "shiftPref")}
+                for profile in staff.profiles
+            ],
+            "roster": data["roster"],
+            "analytics": data.get("analytics", []),
+            "compliance": data.get("compliance", {}),
+        }
+        blob = zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"), 9)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cur = self._conn.execute(
+                    """
+                    INSERT OR IGNORE INTO publications (fingerprint, cycle, ward, year, published_at, staff, payload)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        key,
+                        staff.cycle,
+                        staff.ward_label(),
+                        published.year,
+                        published.isoformat(),
+                        len(staff),
+                        blob,
+                    ),
+                )
+                if cur.rowcount:
+                    self._conn.executemany(
+                        "INSERT INTO archived_shifts (email, year, publication_id, name, shifts) VALUES (?, ?, ?, ?, ?)",
+                        [
+                            (email, published.year, cur.lastrowid, name, _pack_shifts(row))
+                            for email, name, row in zip(staff.emails, staff.names, codes)
+                        ],
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def has_workbook(self, key: str) -> bool:
+        with self._lock:
+            return (
+                self._conn.execute(
+                    """
+                    SELECT 1 FROM archived_workbooks w JOIN publications p ON p.id = w.publication_id
+                    WHERE p.fingerprint = ?
+                    """,
+                    (key,),
+                ).fetchone()
+                is not None
+            )
+
+    def attach_workbook(self, key: str, body: bytes) -> None:
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR IGNORE INTO archived_workbooks (publication_id, body)
+                SELECT id, ? FROM publications WHERE fingerprint = ?
+                """,
+                (body, key),
+            )
+
+    def publications(
+        self, cycle: Optional[str] = None, ward: Optional[str] = None, year: Optional[int] = None
+    ) -> List[Dict]:
+        query = """
+            SELECT p.id, p.cycle, p.ward, p.year, p.published_at, p.staff, LENGTH(p.payload) AS payload_bytes,
+                   w.publication_id IS NOT NULL AS has_workbook
+            FROM publications p LEFT JOIN archived_workbooks w ON w.publication_id = p.id
+        """
+        clauses = []
+        params: List = []
+        for column, value in (("cycle", cycle), ("ward", ward), ("year", year)):
+            if value is not None:
+                clauses.append(f"p.{column} = ?")
+                params.append(value)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(query + where + " ORDER BY p.id DESC", params).fetchall()
+        return [
+            {
+                "id": row["id"],
+                "cycle": row["cycle"],
+                "ward": row["ward"],
+                "year": row["year"],
+                "publishedAt": row["published_at"],
+                "staff": row["staff"],
+                "compressedBytes": row["payload_bytes"],
+                "workbook": f"/archive/publications/{row['id']}/workbook" if row["has_workbook"] else None,
+            }
+            for row in rows
+        ]
+
+    def publication(self, publication_id: int) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, cycle, ward, published_at, payload FROM publications WHERE id = ?", (publication_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        payload = json.loads(zlib.decompress(row["payload"]))
+        return {"id": row["id"], "cycle": row["cycle"], "ward": row["ward"], "publishedAt": row["published_at"], **payload}
+
+    def workbook(self, publication_id: int) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body FROM archived_workbooks WHERE publication_id = ?", (publication_id,)
+            ).fetchone()
+        return row["body"] if row else None
+
+    def shifts(self, email: str, year: Optional[int] = None) -> List[Dict]:
+        """A staff member's archived fortnights, one per cycle from its latest publication.
+
+        A nurse appears in both the all-wards and the single-ward publication of
+        a cycle; whichever was published last is the roster they worked.
+        """
+        query = """
+            SELECT s.year, s.name, s.shifts, s.publication_id, p.cycle, p.ward, p.published_at
+            FROM archived_shifts s JOIN publications p ON p.id = s.publication_id
+            WHERE s.email = ?
+        """
+        params: List = [email]
+        if year is not None:
+            query += " AND s.year = ?"
+            params.append(year)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY s.publication_id", params).fetchall()
+        latest: Dict[str, Dict] = {}
+        for row in rows:
+            latest[row["cycle"]] = {
+                "cycle": row["cycle"],
+                "ward": row["ward"],
+                "year": row["year"],
+                "name": row["name"],
+                "publicationId": row["publication_id"],
+                "publishedAt": row["published_at"],
+                "shifts": _unpack_shifts(row["shifts"]),
+            }
+        return list(latest.values())
+
+
+_roster_archive = RosterArchive(ARCHIVE_PATH)
+
+
+def fetch_cycles() -> List[Dict]:
     cur = conn.execute(
         """
+        SELECT cycle, COUNT(*) AS profiles, MAX(submitted_at) AS last_submitted_at
+        FROM profiles
+        GROUP BY cycle
+        ORDER BY last_submitted_at DESC
+    """
+    )
+    return [
+        {"cycle": row["cycle"], "profiles": row["profiles"], "lastSubmittedAt": row["last_submitted_at"]}
+        for row in cur.fetchall()
+    ]
+
+
+def latest_cycle() -> Optional[str]:
+    row = conn.execute("SELECT cycle FROM profiles ORDER BY submitted_at DESC LIMIT 1").fetchone()
+    return row["cycle"] if row else None
+
+
+def fetch_wards(cycle: str) -> List[str]:
+    cur = conn.execute("SELECT DISTINCT ward FROM profiles WHERE cycle = ? ORDER BY ward", (cycle,))
+    return [row["ward"] for row in cur.fetchall()]
+
+
+def fetch_profiles(
+    cycle: Optional[str] = None,
+    ward: Optional[str] = None,
+    ids: Optional[List[int]] = None,
+    history: bool = False,
+) -> List[Dict]:
+    """Profiles in id order; ``history`` adds the solver's ``previousShifts`` from the preceding cycle."""
+    query = """
         SELECT id, name, email, role, fte, shiftPref, maxNDs, softLock, hardLock, cycle,
                requests_quota, preferences_quota, flexible_work, swap_willing, overtime_opt_in,
                availability_notes, right_to_disconnect_ack, local_induction_complete,
-               supplementary_availability, submitted_at
+               supplementary_availability, ward, leave_days, submitted_at
         FROM profiles
     """
+    clauses = []
+    params: List = []
+    if cycle is not None:
+        clauses.append("cycle = ?")
+        params.append(cycle)
+    if ward is not None:
+        clauses.append("ward = ?")
+        params.append(ward)
+    if ids is not None:
+        clauses.append(f"profiles.id IN ({', '.join('?' for _ in ids)})")
+        params.extend(ids)
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    cur = conn.execute(query + where + " ORDER BY id", params)
+    rows = cur.fetchall()
+
+    availability: Dict[int, Dict[str, List[int]]] = {}
+    cur = conn.execute(
+        "SELECT a.profile_id, a.day, a.kind FROM availability a JOIN profiles ON profiles.id = a.profile_id"
+        + where
+        + " ORDER BY a.profile_id, a.day",
+        params,
     )
+    for profile_id, day, kind in cur.fetchall():
+        availability.setdefault(profile_id, {kind: [] for kind in AVAILABILITY_FIELDS})[kind].append(day)
+    tails = _roster_history.tails({row["cycle"] for row in rows}) if history else {}
+
     profiles = []
-    for row in cur.fetchall():
+    for row in rows:
         profiles.append(
             {
                 "id": row["id"],
@@ -214,6 +1102,8 @@ def fetch_profiles() -> List[Dict]:
                 "maxNDs": row["maxNDs"],
                 "softLock": row["softLock"] or "",
                 "hardLock": row["hardLock"] or "",
+                "leaveDays": row["leave_days"] or "",
+                "availability": availability.get(row["id"], {kind: [] for kind in AVAILABILITY_FIELDS}),
                 "cycle": row["cycle"],
                 "requestsQuota": row["requests_quota"] or DEFAULT_REQUESTS,
                 "preferencesQuota": row["preferences_quota"] or DEFAULT_PREFERENCES,
@@ -224,12 +1114,757 @@ def fetch_profiles() -> List[Dict]:
                 "rightToDisconnectAck": _int_to_bool(row["right_to_disconnect_ack"]),
                 "localInductionComplete": _int_to_bool(row["local_induction_complete"]),
                 "supplementaryAvailability": row["supplementary_availability"] or "",
+                "ward": row["ward"] or DEFAULT_WARD,
                 "submitted_at": row["submitted_at"],
             }
         )
+        if history:
+            profiles[-1]["previousShifts"] = tails.get((row["cycle"], row["email"]), [])
     return profiles
 
 
+def _profiles_fingerprint(profiles: List[Dict]) -> str:
+    """Hash the solver inputs of a profile table (order-sensitive) and the objective settings."""
+    payload = [
+        [OBJECTIVE_MODE, [OBJECTIVE_WEIGHTS[term] for term in OBJECTIVE_TERMS], STAGE_SECONDS],
+        *([profile[field] for field in SOLVER_INPUT_FIELDS] for profile in profiles),
+    ]
+    return hashlib.sha256(json.dumps(payload, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+class StaffTable:
+    """Column-wise, type-coerced view of fetched profiles for the solve, analytics and export paths.
+
+    Rows keep fetch order and are addressed by position; ``row_of`` maps the
+    integer staff (profile) id to its row. Numeric and flag columns are
+    compact arrays parsed once here, so hot loops never re-read profile dicts.
+    The dicts stay available as ``profiles`` for payloads that echo them.
+    """
+
+    __slots__ = (
+        "profiles",
+        "key",
+        "ids",
+        "names",
+        "emails",
+        "roles",
+        "wards",
+        "cycles",
+        "shift_prefs",
+        "fte",
+        "targets",
+        "max_nds",
+        "prefs",
+        "flexible",
+        "swap",
+        "overtime",
+        "blocked",
+        "previous",
+        "row_of",
+    )
+
+    def __init__(self, profiles: List[Dict]):
+        self.profiles = profiles
+        self.key = _profiles_fingerprint(profiles)
+        self.ids = array("q", (p["id"] for p in profiles))
+        self.names = [p["name"] for p in profiles]
+        self.emails = [p["email"] for p in profiles]
+        self.roles = [p["role"] for p in profiles]
+        self.wards = [p["ward"] for p in profiles]
+        self.cycles = [p["cycle"] for p in profiles]
+        self.shift_prefs = [p["shiftPref"] for p in profiles]
+        self.fte = array("d", (float(p["fte"]) for p in profiles))
+        self.targets = array("i", (int(round(fte * DAYS)) for fte in self.fte))
+        self.max_nds = array("i", (int(p["maxNDs"]) for p in profiles))
+        # Index into SHIFTS; -1 (matches no shift) for a legacy unknown preference.
+        self.prefs = array("b", (SHIFTS.index(pref) if pref in SHIFTS else -1 for pref in self.shift_prefs))
+        self.flexible = array("b", (p["flexibleWork"] for p in profiles))
+        self.swap = array("b", (p["swapWilling"] for p in profiles))
+        self.overtime = array("b", (p["overtimeOptIn"] for p in profiles))
+        # Zero-based days each row cannot be rostered (locks and leave).
+        self.blocked = [
+            frozenset(day - 1 for days in p["availability"].values() for day in days if 1 <= day <= DAYS)
+            for p in profiles
+        ]
+        self.previous = [tuple(p["previousShifts"]) for p in profiles]
+        self.row_of = {pid: row for row, pid in enumerate(self.ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def cycle(self) -> str:
+        return self.cycles[0]
+
+    def ward_label(self) -> str:
+        wards = set(self.wards)
+        return wards.pop() if len(wards) == 1 else "All Wards"
+
+    def signature(self, row: int) -> Tuple:
+        """Inputs of the row's per-person solver constraints."""
+        return (self.fte[row], self.max_nds[row], self.blocked[row], self.previous[row], self.flexible[row])
+
+    def display_order(self) -> List[int]:
+        """Rows ordered by role seniority, then name, as rosters are presented."""
+        return sorted(range(len(self.ids)), key=lambda row: (_role_sort_key(self.roles[row]), self.names[row]))
+
+
+class _FlightCall:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls sharing a key onto a single execution.
+
+    The first caller for a key runs ``fn``; callers arriving while it is in
+    flight block until it finishes and receive the same result (or exception).
+    Nothing is cached once the call completes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _FlightCall] = {}
+
+    def do(self, key: str, fn: Callable):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _FlightCall()
+                self._calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+_solve_flight = SingleFlight()
+
+
+class SolverGate:
+    """Limit concurrent solves and shed load once the wait queue is full.
+
+    Rejected callers get a 503 with a ``Retry-After`` estimated from recent
+    solve durations, so overload degrades into fast refusals instead of every
+    request timing out behind an oversubscribed CPU.
+    """
+
+    def __init__(self, concurrency: int, queue_limit: int, queue_timeout: float):
+        self.concurrency = concurrency
+        self.queue_limit = queue_limit
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self.running = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._solve_avg = 1.0
+
+    def _retry_after(self) -> int:
+        backlog = (self.waiting + self.running) / self.concurrency
+        return max(int(round(self._solve_avg * max(backlog, 1))), 1)
+
+    def _overloaded(self, reason: str) -> HTTPException:
+        return HTTPException(
+            status_code=503,
+            detail=f"{reason}; solver is at capacity, retry shortly",
+            headers={"Retry-After": str(self._retry_after())},
+        )
+
+    @contextmanager
+    def slot(self):
+        queued_at = time.monotonic()
+        with self._cond:
+            if self.running >= self.concurrency:
+                if self.waiting >= self.queue_limit:
+                    self.rejected_full += 1
+                    raise self._overloaded("Solver queue is full")
+                self.waiting += 1
+                try:
+                    deadline = queued_at + self.queue_timeout
+                    while self.running >= self.concurrency:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.rejected_timeout += 1
+                            raise self._overloaded("Timed out waiting for a solver slot")
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.running += 1
+            self.admitted += 1
+            waited = time.monotonic() - queued_at
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(started)
+
+    @contextmanager
+    def try_slot(self):
+        """Take a slot only if one is free and nobody is queued; yields whether it was taken."""
+        with self._cond:
+            admitted = self.running < self.concurrency and not self.waiting
+            if admitted:
+                self.running += 1
+                self.admitted += 1
+        if not admitted:
+            yield False
+            return
+        started = time.monotonic()
+        try:
+            yield True
+        finally:
+            self._release(started)
+
+    def timed_out(self, reason: str) -> HTTPException:
+        """The 503 for a caller that gave up waiting elsewhere on the solve path, counted as a timeout."""
+        with self._cond:
+            self.rejected_timeout += 1
+        return self._overloaded(reason)
+
+    def _release(self, started: float) -> None:
+        with self._cond:
+            self.running -= 1
+            self._solve_avg = 0.8 * self._solve_avg + 0.2 * (time.monotonic() - started)
+            self._cond.notify()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "concurrency": self.concurrency,
+                "queueLimit": self.queue_limit,
+                "running": self.running,
+                "queued": self.waiting,
+                "admitted": self.admitted,
+                "rejectedQueueFull": self.rejected_full,
+                "rejectedTimeout": self.rejected_timeout,
+                "avgWaitSeconds": round(self._wait_total / self.admitted, 4) if self.admitted else 0.0,
+                "maxWaitSeconds": round(self._wait_max, 4),
+                "avgSolveSeconds": round(self._solve_avg, 4),
+            }
+
+
+_solver_gate = SolverGate(SOLVER_CONCURRENCY, SOLVER_QUEUE_LIMIT, SOLVER_QUEUE_TIMEOUT)
+
+
+class ResultCache:
+    """Thread-safe LRU of solved rosters keyed by input fingerprint, with optional per-entry expiry."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, Tuple[Dict, Optional[float]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _live(self, key: str) -> Optional[Dict]:
+        entry = self._items.get(key)
+        if entry is None:
+            return None
+        result, expires = entry
+        if expires is not None and expires <= time.monotonic():
+            del self._items[key]
+            return None
+        return result
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            result = self._live(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return self._live(key) is not None
+
+    def put(self, key: str, result: Dict, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._items[key] = (result, time.monotonic() + ttl if ttl is not None else None)
+            self._items.move_to_end(key)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"size": len(self._items), "capacity": self.capacity, "hits": self.hits, "misses": self.misses}
+
+
+_result_cache = ResultCache(RESULT_CACHE_SIZE)
+
+
+class SharedResultStore:
+    """Solve results and rendered exports shared across uvicorn worker processes.
+
+    Entries live in SQLite tables keyed by input fingerprint. ``compute_lock``
+    takes an exclusive ``flock`` on a lock file named by the fingerprint so
+    only one process solves it while the others wait and then read its
+    result; unrelated fingerprints never wait on each other.
+    """
+
+    def __init__(self, db_path: str, lock_dir: str, capacity: int):
+        self.lock_dir = lock_dir
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA busy_timeout = 5000")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS solve_results (
+                fingerprint TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rendered_exports (
+                fingerprint TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                body BLOB NOT NULL,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (fingerprint, kind)
+            )
+            """
+        )
+        if fcntl is not None:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM solve_results WHERE fingerprint = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM solve_results WHERE fingerprint = ?", (key,)).fetchone() is not None
+
+    def put(self, key: str, result: Dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO solve_results (fingerprint, result, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(result, separators=(",", ":")), datetime.now().isoformat()),
+            )
+            self._prune("solve_results")
+
+    def get_export(self, key: str, kind: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body FROM rendered_exports WHERE fingerprint = ? AND kind = ?", (key, kind)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_export(self, key: str, kind: str, body: bytes) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO rendered_exports (fingerprint, kind, body, created_at) VALUES (?, ?, ?, ?)",
+                (key, kind, body, datetime.now().isoformat()),
+            )
+            self._prune("rendered_exports")
+
+    def _prune(self, table: str) -> None:
+        self._conn.execute(
+            f"DELETE FROM {table} WHERE rowid NOT IN (SELECT rowid FROM {table} ORDER BY created_at DESC LIMIT ?)",
+            (self.capacity,),
+        )
+
+    @contextmanager
+    def compute_lock(self, key: str, timeout: float):
+        """Hold the fingerprint's lock; raises ``TimeoutError`` if it is not free within ``timeout`` seconds."""
+        if fcntl is None:
+            yield
+            return
+        path = os.path.join(self.lock_dir, f"solve-{key}.lock")
+        handle = self._acquire(path, time.monotonic() + timeout)
+        try:
+            yield
+        finally:
+            # Unlink while still holding the lock so the directory doesn't grow
+            # by one file per fingerprint; waiters on this file notice and reopen.
+            os.unlink(path)
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+
+    @staticmethod
+    def _acquire(path: str, deadline: float):
+        while True:
+            handle = open(path, "a")
+            try:
+                while True:
+                    try:
+                        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        if time.monotonic() >= deadline:
+                            raise TimeoutError(path)
+                        time.sleep(SOLVE_LOCK_POLL_SECONDS)
+                try:
+                    current = os.stat(path).st_ino == os.fstat(handle.fileno()).st_ino
+                except FileNotFoundError:
+                    current = False
+            except BaseException:
+                handle.close()
+                raise
+            if current:
+                return handle
+            # Locked a file the previous holder already unlinked; retry on the new one.
+            handle.close()
+
+
+_shared_results = SharedResultStore(DB_PATH, SOLVE_LOCK_DIR, SHARED_CACHE_SIZE)
+
+
+class Presolver:
+    """Debounced background re-solve of a roster scope after its profiles change.
+
+    Each submission (re)arms a timer for its ward scope; when the scope has
+    been quiet for ``delay`` seconds the roster is solved through the normal
+    path and lands in the result cache, unless that fingerprint is already
+    cached. Cycle-wide requests solve ward by ward, so these are the scopes
+    readers hit. A speculative solve never queues: when the solver gate
+    has no free slot it is deferred by another ``delay``, leaving capacity
+    to real requests.
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._timers: Dict[Tuple, threading.Timer] = {}
+        self.runs = 0
+        self.skipped = 0
+        self.busy = 0
+        self.failures = 0
+
+    def schedule(self, scope: Tuple) -> None:
+        if self.delay < 0:
+            return
+        with self._lock:
+            previous = self._timers.get(scope)
+            if previous is not None:
+                previous.cancel()
+            timer = threading.Timer(self.delay, self._run, args=(scope,))
+            timer.daemon = True
+            self._timers[scope] = timer
+            timer.start()
+
+    def _run(self, scope: Tuple) -> None:
+        with self._lock:
+            if self._timers.get(scope) is not threading.current_thread():
+                return
+            del self._timers[scope]
+
+        profiles = fetch_profiles(*scope, history=True)
+        if not profiles:
+            self.skipped += 1
+            return
+        staff = StaffTable(profiles)
+        if _is_solved(staff.key):
+            self.skipped += 1
+            return
+        try:
+            with _solver_gate.try_slot() as admitted:
+                if not admitted:
+                    # Try again after another quiet period rather than queue.
+                    self.busy += 1
+                    self.schedule(scope)
+                    return
+                _solve_flight.do(staff.key, lambda: _shared_solve(staff.key, staff, gated=False))
+            self.runs += 1
+        except Exception:
+            # Speculative work only; the next explicit request will surface the error.
+            self.failures += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            pending = len(self._timers)
+        return {
+            "delaySeconds": self.delay,
+            "pending": pending,
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "deferredBusy": self.busy,
+            "failures": self.failures,
+        }
+
+
+_presolver = Presolver(PRESOLVE_DELAY)
+
+
+class RequestTrace:
+    """Sampling CPU profile and per-phase allocation diff for one admin-requested call.
+
+    A sampler thread reads the stacks of every thread that has entered a
+    ``_phase`` of this request and counts them in folded-stack form (phase
+    path first), ready for flamegraph tools. Each phase also records its wall
+    time and the top allocation sites by ``tracemalloc`` snapshot diff.
+    """
+
+    def __init__(self, trace_id: str, method: str, path: str, interval: float):
+        self.trace_id = trace_id
+        self.method = method
+        self.path = path
+        self.interval = interval
+        self.started_at = datetime.now().isoformat()
+        self.stacks: Dict[str, int] = {}
+        self.phases: List[Dict] = []
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._threads: Dict[int, List[str]] = {}
+        self._paused: set = set()
+        self._overhead: Dict[int, float] = {}
+        self._started = 0.0
+        self.wall_seconds = 0.0
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name=f"trace-{trace_id}", daemon=True)
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._sampler.join()
+        self.wall_seconds = time.perf_counter() - self._started
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                threads = [
+                    (ident, "/".join(path))
+                    for ident, path in self._threads.items()
+                    if path and ident not in self._paused
+                ]
+            for ident, phase in threads:
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                key = ";".join([phase, *reversed(stack)])
+                with self._lock:
+                    self.stacks[key] = self.stacks.get(key, 0) + 1
+                    self.samples += 1
+
+    def current_path(self) -> List[str]:
+        with self._lock:
+            return list(self._threads.get(threading.get_ident(), []))
+
+    @contextmanager
+    def adopt(self, path: List[str]):
+        """Sample the calling pool thread under ``path`` while it works for this request."""
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] = list(path)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._threads.pop(ident, None)
+                self._overhead.pop(ident, None)
+
+    @contextmanager
+    def phase(self, name: str):
+        # Snapshot bookkeeping is excluded from samples and from the wall time
+        # of this phase and any enclosing ones.
+        ident = threading.get_ident()
+        mark = time.perf_counter()
+        with self._lock:
+            self._paused.add(ident)
+        before = tracemalloc.take_snapshot()
+        with self._lock:
+            self._paused.discard(ident)
+            self._overhead[ident] = self._overhead.get(ident, 0.0) + time.perf_counter() - mark
+            overhead = self._overhead[ident]
+            path = self._threads.setdefault(ident, [])
+            path.append(name)
+            label = "/".join(path)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            mark = time.perf_counter()
+            with self._lock:
+                seconds = mark - started - (self._overhead[ident] - overhead)
+                self._paused.add(ident)
+            diff = [
+                stat
+                for stat in tracemalloc.take_snapshot().compare_to(before, "lineno")
+                if stat.traceback[0].filename != tracemalloc.__file__
+            ]
+            with self._lock:
+                self._paused.discard(ident)
+                path.pop()
+                self._overhead[ident] += time.perf_counter() - mark
+                self.phases.append(
+                    {
+                        "phase": label,
+                        "seconds": round(seconds, 6),
+                        "topAllocations": [
+                            {
+                                "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                                "sizeDiffKiB": round(stat.size_diff / 1024, 1),
+                                "countDiff": stat.count_diff,
+                            }
+                            for stat in diff[:TRACE_TOP_ALLOCATIONS]
+                        ],
+                    }
+                )
+
+    def artifact(self, status_code: int, peak_bytes: int) -> Dict:
+        with self._lock:
+            return {
+                "id": self.trace_id,
+                "method": self.method,
+                "path": self.path,
+                "status": status_code,
+                "startedAt": self.started_at,
+                "wallSeconds": round(self.wall_seconds, 6),
+                "sampleIntervalMs": self.interval * 1000,
+                "samples": self.samples,
+                "peakTracedKiB": round(peak_bytes / 1024, 1),
+                "phases": list(self.phases),
+                "stacks": dict(sorted(self.stacks.items(), key=lambda item: -item[1])),
+            }
+
+
+_active_trace: ContextVar[Optional[RequestTrace]] = ContextVar("roster_trace", default=None)
+# tracemalloc is process-wide, so only one request is traced at a time.
+_trace_lock = threading.Lock()
+
+
+@contextmanager
+def _phase(name: str):
+    """Mark a phase of the current request for profiling; free when the request isn't traced."""
+    trace = _active_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.phase(name):
+        yield
+
+
+def _in_request_context(fn: Callable) -> Callable:
+    """Bind ``fn`` to the caller's context so work it hands to a pool stays part of a traced request."""
+    context = copy_context()
+    trace = _active_trace.get()
+    path = trace.current_path() if trace is not None else []
+
+    def call(*args):
+        if trace is None:
+            return fn(*args)
+        with trace.adopt(path):
+            return fn(*args)
+
+    # A context can only be entered by one thread at a time; each call gets its own copy.
+    return lambda *args: context.copy().run(call, *args)
+
+
+def _is_admin(request: Request) -> bool:
+    token = request.headers.get("X-Roster-Admin-Token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8"))
+
+
+def _save_trace(artifact: Dict) -> None:
+    os.makedirs(TRACE_DIR, exist_ok=True)
+    path = os.path.join(TRACE_DIR, f"{artifact['id']}.json")
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as handle:
+        json.dump(artifact, handle, indent=1)
+    os.replace(temp_path, path)
+    names = sorted(name for name in os.listdir(TRACE_DIR) if name.endswith(".json"))
+    for name in names[:-TRACE_KEEP]:
+        os.remove(os.path.join(TRACE_DIR, name))
+
+
+@app.middleware("http")
+async def _profile_request(request: Request, call_next):
+    wanted = request.headers.get("X-Roster-Profile") or request.query_params.get("profile")
+    if not wanted or wanted == "0":
+        return await call_next(request)
+    if not _is_admin(request):
+        return JSONResponse({"detail": "Profiling requires a valid X-Roster-Admin-Token"}, status_code=403)
+    if not _trace_lock.acquire(blocking=False):
+        return JSONResponse({"detail": "Another request is being profiled"}, status_code=409)
+
+    try:
+        trace_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{secrets.token_hex(3)}"
+        trace = RequestTrace(trace_id, request.method, request.url.path, TRACE_INTERVAL_MS / 1000)
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        token = _active_trace.set(trace)
+        trace.start()
+        try:
+            response = await call_next(request)
+        finally:
+            trace.stop()
+            _active_trace.reset(token)
+            peak = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+        await run_in_threadpool(_save_trace, trace.artifact(response.status_code, peak))
+    finally:
+        _trace_lock.release()
+    response.headers["X-Roster-Trace"] = f"/admin/traces/{trace_id}"
+    return response
+
+
+@app.get("/admin/traces")
+def list_traces(request: Request):
+    if not _is_admin(request):
+        raise HTTPException(403, "Admin token required")
+    if not os.path.isdir(TRACE_DIR):
+        return []
+    traces = []
+    for name in sorted(os.listdir(TRACE_DIR), reverse=True):
+        if name.endswith(".json"):
+            traces.append({"id": name[: -len(".json")], "download": f"/admin/traces/{name[: -len('.json')]}"})
+    return traces
+
+
+@app.get("/admin/traces/{trace_id}")
+def download_trace(trace_id: str, request: Request):
+    if not _is_admin(request):
+        raise HTTPException(403, "Admin token required")
+    path = os.path.join(TRACE_DIR, f"{os.path.basename(trace_id)}.json")
+    if not os.path.exists(path):
+        raise HTTPException(404, "Trace not found")
+    return FileResponse(path, media_type="application/json", filename=f"roster-trace-{os.path.basename(trace_id)}.json")
+
+
 def _role_sort_key(role: str) -> int:
     try:
         return ROLE_ORDER.index(role)
@@ -237,34 +1872,34 @@ def _role_sort_key(role: str) -> int:
         return len(ROLE_ORDER)
 
 
-def _build_roster_matrix(roster: List[Dict], names: List[str]) -> Dict[str, List[str]]:
-    matrix = {name: ["OFF"] * DAYS for name in names}
-    for day_index, day in enumerate(roster):
-        for shift in SHIFTS:
-            code = SHIFT_CODE_MAP[shift]
-            for name in day[shift]:
-                matrix.setdefault(name, ["OFF"] * DAYS)
-                matrix[name][day_index] = code
-    return matrix
-
-
-def _compute_analytics(matrix: Dict[str, List[str]], profiles: Dict[str, Dict]) -> Tuple[List[Dict], Dict]:
+def _compute_analytics(staff: StaffTable, codes: List[List[str]]) -> Tuple[List[Dict], Dict]:
+    """Per-person fatigue and compliance for per-row ``codes``, in ``staff.display_order()``."""
     analytics = []
     warnings = []
     overall_ok = True
 
-    for name, shifts in matrix.items():
-        profile = profiles.get(name)
-        if not profile:
-            continue
-        fte = float(profile["fte"])
+    for row in staff.display_order():
+        shifts = codes[row]
+        name = staff.names[row]
+        fte = staff.fte[row]
+        flexible = bool(staff.flexible[row])
         weekend_count = sum(1 for idx, shift in enumerate(shifts) if idx in WEEKEND_INDEXES and shift != "OFF")
 
+        # Runs and turnarounds continue from the tail of the previous cycle;
+        # a breach into day 1 is reported at index -1.
+        tail = staff.previous[row]
+        carried = 0
+        for code in reversed(tail):
+            if code == "OFF":
+                break
+            carried += 1
         max_consecutive = 0
-        current_consecutive = 0
+        current_consecutive = carried
         longest_off = 0
         current_off = 0
         rest_breaches = []
+        if tail and shifts and shifts[0] != "OFF" and (tail[-1], shifts[0]) in SHIFT_BANNED_PAIRS:
+            rest_breaches.append((-1, f"{tail[-1]}->{shifts[0]}"))
 
         for idx, shift in enumerate(shifts):
             if shift == "OFF":
@@ -292,14 +1927,14 @@ def _compute_analytics(matrix: Dict[str, List[str]], profiles: Dict[str, Dict])
         if not rest_ok:
             fatigue_score += len(rest_breaches)
             notes.append("Turnaround breach (<10h) detected")
-        if weekend_count > 4 and not profile["flexibleWork"]:
+        if weekend_count > 4 and not flexible:
             fatigue_score += weekend_count - 4
             notes.append("High weekend workload")
-        if fte >= 0.8 and not two_day_break and not profile["flexibleWork"]:
+        if fte >= 0.8 and not two_day_break and not flexible:
             fatigue_score += 2
             notes.append("Missing two consecutive days off")
 
-        compliant = consecutive_ok and rest_ok and (fte < 0.8 or two_day_break or profile["flexibleWork"])
+        compliant = consecutive_ok and rest_ok and (fte < 0.8 or two_day_break or flexible)
 
         if not compliant:
             overall_ok = False
@@ -308,8 +1943,8 @@ def _compute_analytics(matrix: Dict[str, List[str]], profiles: Dict[str, Dict])
         analytics.append(
             {
                 "name": name,
-                "role": profile["role"],
-                "shiftPref": profile["shiftPref"],
+                "role": staff.roles[row],
+                "shiftPref": staff.shift_prefs[row],
                 "fte": fte,
                 "weekendCount": weekend_count,
                 "maxConsecutive": max_consecutive,
@@ -317,24 +1952,21 @@ def _compute_analytics(matrix: Dict[str, List[str]], profiles: Dict[str, Dict])
                 "hasTwoDayBreak": two_day_break,
                 "restBreaches": rest_breaches,
                 "fatigueScore": fatigue_score,
-                "flexibleWork": profile["flexibleWork"],
-                "swapWilling": profile["swapWilling"],
-                "overtimeOptIn": profile["overtimeOptIn"],
+                "flexibleWork": flexible,
+                "swapWilling": bool(staff.swap[row]),
+                "overtimeOptIn": bool(staff.overtime[row]),
                 "compliant": compliant,
                 "notes": notes,
             }
         )
 
-    analytics.sort(key=lambda item: (_role_sort_key(item["role"]), item["name"]))
-
     return analytics, {
         "overall": "pass" if overall_ok else "attention",
         "warnings": warnings,
     }
 
 
-@app.post("/submit-profile")
-def submit_profile(profile: Profile):
+def _validate_profile(profile: Profile) -> None:
     # Validation step 1: Right to Disconnect acknowledgement
     if not profile.rightToDisconnectAck:
         raise HTTPException(status_code=400, detail="Right to Disconnect acknowledgement is required.")
@@ -370,14 +2002,19 @@ def submit_profile(profile: Profile):
         raise HTTPException(status_code=400, detail=error_msg)
     
     # Validation step 8: Soft lock format
-    valid, error_msg, _ = validate_lock_format(profile.softLock)
+    valid, error_msg, _ = parse_lock_days(profile.softLock)
     if not valid:
         raise HTTPException(status_code=400, detail=f"Soft lock: {error_msg}")
     
     # Validation step 9: Hard lock format
-    valid, error_msg, _ = validate_lock_format(profile.hardLock)
+    valid, error_msg, _ = parse_lock_days(profile.hardLock)
     if not valid:
         raise HTTPException(status_code=400, detail=f"Hard lock: {error_msg}")
+
+    # Validation step 9b: Leave days format
+    valid, error_msg, _ = parse_lock_days(profile.leaveDays)
+    if not valid:
+        raise HTTPException(status_code=400, detail=f"Leave days: {error_msg}")
     
     # Validation step 10: Request/preference quotas
     if profile.requestsQuota < 0 or profile.requestsQuota > 4:
@@ -385,161 +2022,1011 @@ def submit_profile(profile: Profile):
     if profile.preferencesQuota < 0 or profile.preferencesQuota > 4:
         raise HTTPException(status_code=400, detail="Preferences quota must be 0-4")
 
+    # Validation step 11: Ward
+    valid, error_msg = validate_ward(profile.ward)
+    if not valid:
+        raise HTTPException(status_code=400, detail=error_msg)
+
+
+async def _write_profile(op: str, profile_id: Optional[int] = None, profile: Optional[Profile] = None) -> Dict:
     try:
-        conn.execute(
-            """
-            INSERT INTO profiles (
-                name, email, role, fte, shiftPref, maxNDs, softLock, hardLock, cycle,
-                requests_quota, preferences_quota, flexible_work, swap_willing, overtime_opt_in,
-                availability_notes, right_to_disconnect_ack, local_induction_complete,
-                supplementary_availability, submitted_at
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                profile.name.strip(),
-                profile.email.strip(),
-                profile.role.upper(),
-                profile.fte,
-                profile.shiftPref,
-                profile.maxNDs,
-                profile.softLock,
-                profile.hardLock,
-                profile.cycle,
-                profile.requestsQuota,
-                profile.preferencesQuota,
-                _bool_to_int(profile.flexibleWork),
-                _bool_to_int(profile.swapWilling),
-                _bool_to_int(profile.overtimeOptIn),
-                profile.availabilityNotes,
-                _bool_to_int(profile.rightToDisconnectAck),
-                _bool_to_int(profile.localInductionComplete),
-                profile.supplementaryAvailability,
-                datetime.now().isoformat(),
-            ),
-        )
-        conn.commit()
-        return {"status": "success"}
+        if op == "insert":
+            outcome = await _profile_writer.insert(profile)
+        elif op == "update":
+            outcome = await _profile_writer.update(profile_id, profile)
+        else:
+            outcome = await _profile_writer.delete(profile_id)
+    except KeyError:
+        raise HTTPException(404, "Profile not found")
     except sqlite3.IntegrityError:
-        raise HTTPException(400, "Email already submitted")
+        raise HTTPException(400, "Email already submitted for this cycle")
     except Exception as e:
         raise HTTPException(500, f"Database error: {str(e)}")
 
+    _presolver.schedule(outcome["scope"])
+    if outcome["previousScope"] and outcome["previousScope"] != outcome["scope"]:
+        _presolver.schedule(outcome["previousScope"])
+    return outcome
+
+
+@app.post("/submit-profile")
+async def submit_profile(profile: Profile):
+    _validate_profile(profile)
+    await _write_profile("insert", profile=profile)
+    return {"status": "success"}
+
+
+@app.put("/profiles/{profile_id}")
+async def update_profile(profile_id: int, profile: Profile):
+    _validate_profile(profile)
+    outcome = await _write_profile("update", profile_id, profile)
+    return {"status": "success", "id": profile_id, "seq": outcome["seq"]}
+
+
+@app.delete("/profiles/{profile_id}")
+async def delete_profile(profile_id: int):
+    outcome = await _write_profile("delete", profile_id)
+    return {"status": "success", "id": profile_id, "seq": outcome["seq"]}
+
+
+def _profiles_snapshot(cycle: Optional[str], ward: Optional[str]) -> Tuple[List[Dict], int]:
+    # Read the change head before the profiles: a feed subscribed with
+    # ?since=head replays anything committed in between, and replaying a
+    # change the snapshot already has is harmless.
+    head = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM profile_changes").fetchone()[0]
+    return fetch_profiles(cycle, ward), head
+
 
 @app.get("/profiles")
-def get_profiles():
-    return fetch_profiles()
+async def get_profiles(response: Response, cycle: Optional[str] = None, ward: Optional[str] = None):
+    profiles, head = await run_in_threadpool(_profiles_snapshot, cycle, ward)
+    response.headers["X-Change-Seq"] = str(head)
+    return profiles
 
 
-@app.get("/generate-roster")
-def generate_roster():
-    profiles = fetch_profiles()
-    if not profiles:
+def fetch_changes(since: int, cycle: Optional[str] = None, limit: int = CHANGE_FEED_PAGE) -> Tuple[List[Dict], int]:
+    """Changes after ``since`` in seq order, each with the profile's current state (None once deleted).
+
+    Also returns the highest seq scanned. With a ``cycle`` filter it runs
+    past the last matching change, so callers resume (and wait) from there
+    instead of rescanning other cycles' writes.
+    """
+    head = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM profile_changes").fetchone()[0]
+    query = "SELECT seq, profile_id, op, cycle, ward, changed_at FROM profile_changes WHERE seq > ?"
+    params: List = [since]
+    if cycle is not None:
+        query += " AND cycle = ?"
+        params.append(cycle)
+    rows = conn.execute(query + " ORDER BY seq LIMIT ?", params + [limit]).fetchall()
+    if len(rows) == limit:
+        scanned = rows[-1]["seq"]
+    else:
+        scanned = max(head, since, rows[-1]["seq"] if rows else 0)
+    current = {p["id"]: p for p in fetch_profiles(ids=list({row["profile_id"] for row in rows}))} if rows else {}
+    changes = [
+        {
+            "seq": row["seq"],
+            "op": row["op"],
+            "profileId": row["profile_id"],
+            "cycle": row["cycle"],
+            "ward": row["ward"],
+            "changedAt": row["changed_at"],
+            "profile": current.get(row["profile_id"]),
+        }
+        for row in rows
+    ]
+    return changes, scanned
+
+
+@app.get("/profiles/changes")
+async def profile_changes(request: Request, since: Optional[int] = None, cycle: Optional[str] = None):
+    """Server-sent events feed of profile inserts, updates and deletes.
+
+    Each event's id is its change seq. Without ``since`` (or a Last-Event-ID
+    header from a reconnecting EventSource) the feed starts at the current
+    head; otherwise it replays everything after that seq first.
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    if since is None:
+        since = await run_in_threadpool(
+            lambda: conn.execute("SELECT COALESCE(MAX(seq), 0) FROM profile_changes").fetchone()[0]
+        )
+
+    async def stream():
+        last = since
+        yield f"retry: 3000\nid: {last}\nevent: ready\ndata: {json.dumps({'seq': last})}\n\n"
+        while not await request.is_disconnected():
+            changes, scanned = await run_in_threadpool(fetch_changes, last, cycle)
+            for change in changes:
+                yield f"id: {change['seq']}\nevent: {change['op']}\ndata: {json.dumps(change)}\n\n"
+            last = scanned
+            if len(changes) == CHANGE_FEED_PAGE:
+                continue
+            # Woken immediately by this worker's writes; the timeout also picks up
+            # changes committed by other worker processes. Waiting from the
+            # scanned seq keeps other cycles' writes from waking us in a loop.
+            if not await _change_feed.wait(last, CHANGE_FEED_POLL_SECONDS):
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/cycles")
+def get_cycles():
+    return fetch_cycles()
+
+
+def _resolve_cycle(cycle: Optional[str]) -> str:
+    """Default roster endpoints to the cycle with the most recent submission."""
+    if cycle:
+        return cycle
+    latest = latest_cycle()
+    if latest is None:
         raise HTTPException(400, "No profiles")
+    return latest
 
-    staff_names = [p["name"] for p in profiles]
-    name_index = {name: idx for idx, name in enumerate(staff_names)}
 
-    prob = LpProblem("Roster", LpMinimize)
+def _roster_for(staff: StaffTable, gated: bool = True) -> Dict:
+    """Solve the roster for ``staff``, reusing a cached or in-flight solve of the same inputs.
 
-    x = LpVariable.dicts("assign", (range(len(staff_names)), range(DAYS), range(len(SHIFTS))), cat=LpBinary)
+    ``gated=False`` is for callers already holding a solver slot.
+    """
+    key = staff.key
+    cached = _result_cache.get(key)
+    if cached is not None:
+        return cached
+    return _solve_flight.do(key, lambda: _shared_solve(key, staff, gated))
 
-    for i in range(len(staff_names)):
-        for d in range(DAYS):
-            prob += lpSum(x[i][d][k] for k in range(len(SHIFTS))) <= 1
+
+def _is_solved(key: str) -> bool:
+    return key in _result_cache or key in _shared_results
+
+
+def _shared_solve(key: str, staff: StaffTable, gated: bool = True) -> Dict:
+    """Read the solve from the cross-process store, computing it under the fingerprint lock if absent.
+
+    ``gated=False`` is for callers already holding a solver slot.
+    """
+    result = _shared_results.get(key)
+    if result is None:
+        with ExitStack() as stack:
+            try:
+                stack.enter_context(_shared_results.compute_lock(key, SOLVER_QUEUE_TIMEOUT))
+            except TimeoutError:
+                raise _solver_gate.timed_out("Timed out waiting for another worker's solve") from None
+            result = _shared_results.get(key)
+            if result is None:
+                result = _gated_solve(staff) if gated else _solve_roster(staff)
+                if result.get("provisional"):
+                    _result_cache.put(key, result, PROVISIONAL_RESULT_TTL)
+                    return result
+                _shared_results.put(key, result)
+    _result_cache.put(key, result)
+    return result
+
+
+def _gated_solve(staff: StaffTable) -> Dict:
+    with _solver_gate.slot():
+        return _solve_roster(staff)
+
+
+@app.get("/solver-stats")
+def solver_stats():
+    stats = _solver_gate.stats()
+    stats["resultCache"] = _result_cache.stats()
+    stats["presolve"] = _presolver.stats()
+    stats["models"] = _model_sessions.stats()
+    stats["portfolio"] = _portfolio.stats()
+    return stats
+
+
+def _scope_roster(cycle: Optional[str], ward: Optional[str]) -> Tuple[StaffTable, Dict]:
+    """Solve one ward, or each ward of the cycle on its own so every ward keeps its own cover."""
+    with _phase("fetch_profiles"):
+        profiles = fetch_profiles(_resolve_cycle(cycle), ward, history=True)
+        if not profiles:
+            raise HTTPException(400, "No profiles")
+        by_ward: Dict[str, List[Dict]] = {}
+        for profile in profiles:
+            by_ward.setdefault(profile["ward"], []).append(profile)
+        parts = [StaffTable(by_ward[name]) for name in sorted(by_ward)]
+    with _phase("solve"):
+        if len(parts) == 1:
+            return parts[0], _roster_for(parts[0])
+        if all(_is_solved(part.key) for part in parts):
+            results = [_roster_for(part) for part in parts]
+        else:
+            # One admission for the whole request: its wards are solved in
+            # turn under a single solver slot, so the gate queues and sheds
+            # cycle-wide requests like any other solve.
+            with _solver_gate.slot():
+                results = [_roster_for(part, gated=False) for part in parts]
+    return _merge_ward_rosters(parts, results)
+
+
+def _merge_ward_rosters(parts: List[StaffTable], results: List[Dict]) -> Tuple[StaffTable, Dict]:
+    """Combine separately solved ward rosters into one cycle-wide roster."""
+    staff = StaffTable([profile for part in parts for profile in part.profiles])
+    for part, result in zip(parts, results):
+        if result.get("status") != "valid":
+            return staff, {
+                "status": result.get("status", "infeasible"),
+                "message": f"{part.ward_label()}: {result.get('message', 'Roster not compliant')}",
+                "provisional": bool(result.get("provisional")),
+            }
+    roster = [{"day": d + 1, "AM": [], "PM": [], "ND": []} for d in range(DAYS)]
+    for result in results:
+        for day, ward_day in zip(roster, result["roster"]):
+            for shift in SHIFTS:
+                day[shift].extend(ward_day[shift])
+    codes = [row for result in results for row in result["codes"]]
+    analytics, compliance = _compute_analytics(staff, codes)
+    return staff, {
+        "status": "valid",
+        "roster": roster,
+        "codes": codes,
+        "analytics": analytics,
+        "compliance": compliance,
+        "objective": {
+            "mode": OBJECTIVE_MODE,
+            "wards": {part.ward_label(): result.get("objective") for part, result in zip(parts, results)},
+        },
+        "provisional": any(result.get("provisional") for result in results),
+    }
+
+
+@app.get("/generate-roster")
+def generate_roster(cycle: Optional[str] = None, ward: Optional[str] = None):
+    return _scope_roster(cycle, ward)[1]
+
+
+class SolverPortfolio:
+    """Race several CBC configurations of one model and keep the first proven optimum.
+
+    The model is written once as MPS (plus one more per variant that adds
+    rows) and each variant runs as its own ``cbc`` process in a new session
+    with a shared deadline. The first variant to prove optimality wins and
+    the rest are killed; if none does by the deadline, the best incumbent
+    found so far is used.
+    """
+
+    def __init__(self, size: int, deadline: float):
+        self.size = size
+        self.deadline = deadline
+        self._lock = threading.Lock()
+        self.races = 0
+        self.deadline_hits = 0
+        self.wins: Dict[str, int] = {}
+
+    def solve(
+        self, prob: LpProblem, variants: List[Dict], deadline: Optional[float] = None
+    ) -> Tuple[int, Optional[str], bool]:
+        """Solve ``prob`` in place; return (pulp status, winning variant, proven optimal)."""
+        deadline = min(deadline or self.deadline, self.deadline)
+        cbc = PULP_CBC_CMD(msg=False)
+        workdir = tempfile.mkdtemp(prefix="roster-portfolio-")
+        racers = []
+        try:
+            base = prob.writeMPS(os.path.join(workdir, "model.mps"), rename=1)
+            for index, variant in enumerate(variants):
+                mps, written = os.path.join(workdir, "model.mps"), base
+                if variant.get("constraints"):
+                    for name, constraint in variant["constraints"].items():
+                        prob.addConstraint(constraint, name)
+                    try:
+                        mps = os.path.join(workdir, f"model-{index}.mps")
+                        written = prob.writeMPS(mps, rename=1)
+                    finally:
+                        for name in variant["constraints"]:
+                            del prob.constraints[name]
+                args = [cbc.path, mps]
+                if variant.get("start"):
+                    mst = os.path.join(workdir, f"start-{index}.mst")
+                    _write_cbc_start(mst, written[1], variant["start"])
+                    args += ["mips", mst]
+                solution = os.path.join(workdir, f"solution-{index}.sol")
+                args += ["sec", str(deadline), *variant.get("options", [])]
+                args += ["branch", "printingOptions", "all", "solution", solution]
+                process = subprocess.Popen(
+                    args,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    start_new_session=True,
+                )
+                racers.append((variant["name"], process, solution, written))
+
+            winner = None
+            finished = []
+            give_up = time.monotonic() + deadline + PORTFOLIO_GRACE_SECONDS
+            while winner is None and len(finished) < len(racers) and time.monotonic() < give_up:
+                time.sleep(PORTFOLIO_POLL_SECONDS)
+                for racer in racers:
+                    name, process, solution, _ = racer
+                    if racer in finished or process.poll() is None:
+                        continue
+                    finished.append(racer)
+                    outcome = _read_cbc_outcome(solution) if process.returncode == 0 else None
+                    # Infeasibility is a property of the shared rows, so any proof ends the race.
+                    if outcome is not None and outcome[0] in ("Optimal", "Infeasible"):
+                        winner = (racer, outcome)
+                        break
+
+            if winner is None:
+                feasible = []
+                for racer in finished:
+                    outcome = _read_cbc_outcome(racer[2]) if racer[1].returncode == 0 else None
+                    if outcome is not None and outcome[0] == "Stopped" and outcome[1] is not None:
+                        feasible.append((outcome[1], racer, outcome))
+                if feasible:
+                    _, racer, outcome = min(feasible, key=lambda item: item[0])
+                    winner = (racer, outcome)
+                with self._lock:
+                    self.deadline_hits += 1
+        finally:
+            for _, process, _, _ in racers:
+                if process.poll() is None:
+                    _kill_solver(process)
+
+            status = LpStatusNotSolved
+            name = None
+            proven = False
+            if racers and winner is not None:
+                (name, _, solution, written), (kind, _) = winner
+                proven = kind == "Optimal"
+                if kind == "Infeasible":
+                    status = LpStatusInfeasible
+                else:
+                    _, values, _, _, _, _ = cbc.readsol_MPS(solution, prob, written[0], written[1], written[2])
+                    prob.assignVarsVals(values)
+                    # Same guard as the single-solve path: only accept values that satisfy every row.
+                    status = LpStatusOptimal if prob.valid(1e-5) else LpStatusNotSolved
+                    proven = proven and status == LpStatusOptimal
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        with self._lock:
+            self.races += 1
+            if name is not None:
+                self.wins[name] = self.wins.get(name, 0) + 1
+        prob.status = status
+        return status, name, proven
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "deadlineSeconds": self.deadline,
+                "races": self.races,
+                "deadlineHits": self.deadline_hits,
+                "wins": dict(self.wins),
+            }
+
+
+_portfolio = SolverPortfolio(PORTFOLIO_SIZE, PORTFOLIO_DEADLINE)
+
+
+def _kill_solver(process: subprocess.Popen) -> None:
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+    process.wait()
+
+
+def _write_cbc_start(path: str, variable_names: Dict[str, str], start: Dict[str, float]) -> None:
+    """Write a CBC MIP start in the same layout pulp uses for ``warmStart``."""
+    with open(path, "w") as handle:
+        handle.write("Stopped on time - objective value 0\n")
+        for index, (name, mps_name) in enumerate(variable_names.items()):
+            handle.write("{0:>7} {1} {2:>15} {3:>23}\n".format(index, mps_name, start.get(name, 0), 0))
+
+
+# First word of a CBC solution header, mapped as pulp's ``readsol_MPS`` does:
+# "Integer infeasible" is a proof of infeasibility, not an incumbent.
+CBC_STATUS_WORDS = {
+    "Optimal": "Optimal",
+    "Infeasible": "Infeasible",
+    "Integer": "Infeasible",
+    "Unbounded": "Unbounded",
+    "Stopped": "Stopped",
+}
+
+
+def _read_cbc_outcome(path: str) -> Optional[Tuple[str, Optional[float]]]:
+    """Return (status, objective or None) from a CBC solution file.
+
+    Status is one of ``CBC_STATUS_WORDS``' values; an unknown header yields None.
+    """
+    try:
+        with open(path) as handle:
+            header = handle.readline()
+    except OSError:
+        return None
+    words = header.split()
+    if not words or words[0] not in CBC_STATUS_WORDS:
+        return None
+    objective = None
+    if "objective value" in header:
+        try:
+            objective = float(header.rsplit(" ", 1)[-1])
+        except ValueError:
+            pass
+    # CBC reports 1e+50 when it stopped without any incumbent.
+    if objective is not None and objective >= 1e49:
+        objective = None
+    return CBC_STATUS_WORDS[words[0]], objective
+
+
+def _greedy_start(staff: StaffTable) -> Dict[Tuple[int, int, int], int]:
+    """Cheap constructive roster used as a MIP start when there is no previous roster.
+
+    Covers each shift with the least-loaded eligible person, then tops people
+    up towards their FTE target on preferred shifts. It respects locks, ND
+    limits, banned turnarounds and the six-in-seven rule, but not necessarily
+    every row, in which case CBC simply discards it.
+    """
+    codes = [["OFF"] * DAYS for _ in range(len(staff))]
+    targets = staff.targets
+
+    def eligible(i: int, d: int, shift: str) -> bool:
+        row = codes[i]
+        if row[d] != "OFF" or d in staff.blocked[i] or row.count("OFF") <= DAYS - targets[i] - 1:
+            return False
+        if shift == "ND" and row.count("N") >= staff.max_nds[i]:
+            return False
+        code = SHIFT_CODE_MAP[shift]
+        tail = staff.previous[i]
+        before = row[d - 1] if d > 0 else (tail[-1] if tail else "OFF")
+        if before != "OFF" and (before, code) in SHIFT_BANNED_PAIRS:
+            return False
+        if d < DAYS - 1 and row[d + 1] != "OFF" and (code, row[d + 1]) in SHIFT_BANNED_PAIRS:
+            return False
+        history = list(tail) + row
+        at = len(tail) + d
+        for start in range(max(at - 6, 0), at + 1):
+            window = history[start : start + 7]
+            if sum(1 for c in window if c != "OFF") + 1 > 6:
+                return False
+        return True
 
     for d in range(DAYS):
-        for k in range(len(SHIFTS)):
-            prob += lpSum(x[i][d][k] for i in range(len(staff_names))) >= 1
+        for k, shift in ((2, "ND"), (0, "AM"), (1, "PM")):
+            candidates = [i for i in range(len(staff)) if eligible(i, d, shift)]
+            if candidates:
+                chosen = min(
+                    candidates,
+                    key=lambda i: ((DAYS - codes[i].count("OFF")) / max(targets[i], 1), staff.prefs[i] != k),
+                )
+                codes[chosen][d] = SHIFT_CODE_MAP[shift]
+    for i, k in enumerate(staff.prefs):
+        if k < 0:
+            continue
+        for d in range(DAYS):
+            if DAYS - codes[i].count("OFF") >= targets[i]:
+                break
+            if eligible(i, d, SHIFTS[k]):
+                codes[i][d] = SHIFT_CODE_MAP[SHIFTS[k]]
 
-    for i, profile in enumerate(profiles):
-        fte = float(profile["fte"])
-        target = int(round(fte * DAYS))
-        work_total = lpSum(x[i][d][k] for d in range(DAYS) for k in range(len(SHIFTS)))
-        prob += work_total >= max(target - 1, 0)
-        prob += work_total <= target + 1
+    index = {SHIFT_CODE_MAP[shift]: k for k, shift in enumerate(SHIFTS)}
+    return {
+        (staff.ids[i], d, index[code]): 1 for i, row in enumerate(codes) for d, code in enumerate(row) if code != "OFF"
+    }
 
-    for i, profile in enumerate(profiles):
-        for start in range(DAYS - 6):
-            prob += lpSum(x[i][d][k] for d in range(start, start + 7) for k in range(len(SHIFTS))) <= 6
 
-        max_nds = int(profile["maxNDs"])
-        prob += lpSum(x[i][d][2] for d in range(DAYS)) <= max_nds
+class RosterModel:
+    """Persistent roster MILP for one (cycle, wards) scope, patched in place between solves.
 
-        soft_lock = profile["softLock"]
-        hard_lock = profile["hardLock"]
+    Variables and per-person constraints are keyed by staff id. On each solve
+    only staff whose constraint inputs changed get their rows rebuilt; new staff
+    get variables, withdrawn staff are dropped. Coverage rows and the objective
+    are cheap and rebuilt every time. The last feasible assignment seeds CBC's
+    warm start and a tie-break term that keeps unchanged shifts where they were.
 
-        if hard_lock:
-            try:
-                day = int(hard_lock.split("-")[-1]) - 1
-                if 0 <= day < DAYS:
-                    prob += lpSum(x[i][day][k] for k in range(len(SHIFTS))) == 0
-            except ValueError:
-                pass
+    The objective combines off-preference shifts, a fatigue score mirroring
+    ``_compute_analytics``, and the largest per-person weekend and night load,
+    either weighted in one solve or optimised lexicographically in stages,
+    each stage bounded by ``STAGE_SECONDS`` and warm-started from the last.
+    """
 
-        if soft_lock:
-            try:
-                day = int(soft_lock.split("-")[-1]) - 1
-                if 0 <= day < DAYS:
-                    prob += lpSum(x[i][day][k] for k in range(len(SHIFTS))) <= 0
-            except ValueError:
-                pass
+    def __init__(self, name: str):
+        self.prob = LpProblem(name, LpMinimize)
+        self._lock = threading.Lock()
+        self._vars: Dict[int, Dict[Tuple[int, int], LpVariable]] = {}
+        self._signatures: Dict[int, Tuple] = {}
+        self._rows: Dict[int, List[str]] = {}
+        self._coverage_rows: List[str] = []
+        self._previous: Dict[int, Dict[Tuple[int, int], int]] = {}
+        self._aux: Dict[int, Dict[str, LpVariable]] = {}
+        self._fatigue: Dict[int, object] = {}
+        self._weekend_max = LpVariable("weekend_max", lowBound=0)
+        self._nights_max = LpVariable("nights_max", lowBound=0)
+        self.solves = 0
+        self.warm_solves = 0
+        self.patched = 0
+        self.last_seconds = 0.0
+
+    def _drop_rows(self, pid: int) -> None:
+        for name in self._rows.pop(pid, []):
+            del self.prob.constraints[name]
+
+    def _add_person(self, staff: StaffTable, row: int) -> None:
+        pid = staff.ids[row]
+        self._drop_rows(pid)
+        if pid not in self._vars:
+            self._vars[pid] = {
+                (d, k): LpVariable(f"assign_{pid}_{d}_{k}", cat=LpBinary) for d in range(DAYS) for k in range(len(SHIFTS))
+            }
+        x = self._vars[pid]
+        rows = []
+
+        def add(constraint, tag: str) -> None:
+            name = f"p{pid}_{tag}"
+            self.prob.addConstraint(constraint, name)
+            rows.append(name)
+
+        for d in range(DAYS):
+            add(lpSum(x[d, k] for k in range(len(SHIFTS))) <= 1, f"day{d}")
+
+        target = staff.targets[row]
+        work_total = lpSum(x.values())
+        add(work_total >= max(target - 1, 0), "min_work")
+        add(work_total <= target + 1, "max_work")
+
+        for start in range(DAYS - 6):
+            add(lpSum(x[d, k] for d in range(start, start + 7) for k in range(len(SHIFTS))) <= 6, f"window{start}")
+
+        add(lpSum(x[d, 2] for d in range(DAYS)) <= staff.max_nds[row], "max_nds")
+
+        for day in staff.blocked[row]:
+            add(lpSum(x[day, k] for k in range(len(SHIFTS))) == 0, f"blocked{day}")
 
         for d in range(DAYS - 1):
             for k1, shift1 in enumerate(SHIFTS):
                 for k2, shift2 in enumerate(SHIFTS):
                     if (SHIFT_CODE_MAP[shift1], SHIFT_CODE_MAP[shift2]) in SHIFT_BANNED_PAIRS:
-                        prob += x[i][d][k1] + x[i][d + 1][k2] <= 1
-
-    pref_penalty = lpSum(
-        x[name_index[profile["name"]]][d][k]
-        for profile in profiles
-        for d in range(DAYS)
-        for k in range(len(SHIFTS))
-        if SHIFTS[k] != profile["shiftPref"]
-    )
-    prob += pref_penalty
+                        add(x[d, k1] + x[d + 1, k2] <= 1, f"pair{d}_{k1}{k2}")
+
+        # Continuity with the previous cycle: windows that start before day 1
+        # and the turnaround from its last day into day 1.
+        tail = staff.previous[row]
+        for offset in range(1, len(tail) + 1):
+            carried = sum(1 for code in tail[-offset:] if code != "OFF")
+            if carried:
+                add(
+                    lpSum(x[d, k] for d in range(7 - offset) for k in range(len(SHIFTS))) <= 6 - carried,
+                    f"carry_window{offset}",
+                )
+        if tail:
+            for k, shift in enumerate(SHIFTS):
+                if (tail[-1], SHIFT_CODE_MAP[shift]) in SHIFT_BANNED_PAIRS:
+                    add(x[0, k] == 0, f"carry_pair{k}")
+
+        # Fairness and fatigue terms. Auxiliaries are continuous: at any
+        # integral assignment they settle on integral values, and CBC can
+        # complete them itself from a MIP start that only sets ``x``.
+        if pid not in self._aux:
+            self._aux[pid] = {
+                "weekend_excess": LpVariable(f"weekend_excess_{pid}", lowBound=0),
+                "no_break": LpVariable(f"no_break_{pid}", lowBound=0),
+                **{f"break{d}": LpVariable(f"break_{pid}_{d}", lowBound=0, upBound=1) for d in range(DAYS - 1)},
+            }
+        aux = self._aux[pid]
+        weekend = lpSum(x[d, k] for d in WEEKEND_INDEXES for k in range(len(SHIFTS)))
+        add(self._weekend_max >= weekend, "weekend_max")
+        add(self._nights_max >= lpSum(x[d, 2] for d in range(DAYS)), "nights_max")
+        fatigue = []
+        if not staff.flexible[row]:
+            add(aux["weekend_excess"] >= weekend - 4, "weekend_excess")
+            fatigue.append(aux["weekend_excess"])
+            if staff.fte[row] >= 0.8:
+                for d in range(DAYS - 1):
+                    for day in (d, d + 1):
+                        add(aux[f"break{d}"] <= 1 - lpSum(x[day, k] for k in range(len(SHIFTS))), f"break{d}_{day}")
+                add(aux["no_break"] >= 1 - lpSum(aux[f"break{d}"] for d in range(DAYS - 1)), "two_day_break")
+                fatigue.append(2 * aux["no_break"])
+        self._fatigue[pid] = lpSum(fatigue)
+
+        self._rows[pid] = rows
+        self._signatures[pid] = staff.signature(row)
+        self.patched += 1
+
+    def _sync(self, staff: StaffTable) -> None:
+        current = staff.row_of
+        withdrawn = [pid for pid in self._vars if pid not in current]
+        for pid in withdrawn:
+            self._drop_rows(pid)
+            del self._vars[pid]
+            self._aux.pop(pid, None)
+            self._fatigue.pop(pid, None)
+            self._signatures.pop(pid, None)
+            self._previous.pop(pid, None)
+        if withdrawn:
+            # LpProblem never forgets a variable once seen; carry the rows over
+            # to a fresh problem so withdrawn staff leave no stray columns.
+            prob = LpProblem(self.prob.name, LpMinimize)
+            prob.constraints = self.prob.constraints
+            self.prob = prob
+        for row, pid in enumerate(staff.ids):
+            if self._signatures.get(pid) != staff.signature(row):
+                self._add_person(staff, row)
+
+        for name in self._coverage_rows:
+            del self.prob.constraints[name]
+        self._coverage_rows = []
+        for d in range(DAYS):
+            for k in range(len(SHIFTS)):
+                name = f"cover{d}_{k}"
+                self.prob.addConstraint(lpSum(self._vars[pid][d, k] for pid in staff.ids) >= 1, name)
+                self._coverage_rows.append(name)
+
+    def _objective_terms(self, staff: StaffTable) -> Dict[str, object]:
+        return {
+            "preference": lpSum(
+                var
+                for pid, pref in zip(staff.ids, staff.prefs)
+                for (d, k), var in self._vars[pid].items()
+                if k != pref
+            ),
+            "fatigue": lpSum(self._fatigue[pid] for pid in staff.ids),
+            "weekend": self._weekend_max,
+            "nights": self._nights_max,
+        }
+
+    def _churn(self, staff: StaffTable) -> Tuple[object, int]:
+        """Distance from the last roster, and how many cells it covers."""
+        churn = []
+        for pid in staff.ids:
+            previous = self._previous.get(pid)
+            if previous is None:
+                continue
+            for key, var in self._vars[pid].items():
+                churn.append(1 - var if previous.get(key) else var)
+        return lpSum(churn), len(churn)
+
+    def _stages(self, terms: Dict[str, object]) -> List[Tuple[str, object]]:
+        if OBJECTIVE_MODE == "lexicographic":
+            return [(name, terms[name]) for name in OBJECTIVE_TERMS]
+        if OBJECTIVE_MODE == "weighted":
+            weighted = lpSum(OBJECTIVE_WEIGHTS[name] * terms[name] for name in OBJECTIVE_TERMS if OBJECTIVE_WEIGHTS[name])
+            return [("weighted", weighted)]
+        return [("preference", terms["preference"])]
+
+    def _run(self, staff: StaffTable, warm: bool) -> Tuple[int, bool]:
+        """One time-boxed solve of the current objective; returns (status, proven optimal)."""
+        if _portfolio.size > 1:
+            status, _, optimal = _portfolio.solve(self.prob, self._portfolio_variants(staff, warm), STAGE_SECONDS)
+            return status, optimal
+        status = self.prob.solve(PULP_CBC_CMD(msg=False, warmStart=warm, timeLimit=STAGE_SECONDS))
+        optimal = self.prob.sol_status == LpSolutionOptimal
+        # pulp reports a time-out as solved whenever CBC prints an objective,
+        # even without an incumbent; only trust values that satisfy every row.
+        if status == LpStatusOptimal and not optimal and not self.prob.valid(1e-5):
+            status = LpStatusNotSolved
+        return status, optimal
+
+    def _optimise(self, staff: StaffTable, warm: bool) -> Tuple[int, Dict, bool]:
+        """Solve each objective stage, bounding earlier stages at their achieved values.
+
+        Returns (status, report, proven), where proven means every stage ran
+        and was solved to optimality within its time limit.
+        """
+        terms = self._objective_terms(staff)
+        churn, cells = self._churn(staff)
+        report = {"mode": OBJECTIVE_MODE, "stages": []}
+        solution = None
+        status = LpStatusNotSolved
+        bounds = []
+        try:
+            stages = self._stages(terms)
+            for index, (name, expr) in enumerate(stages):
+                # Distance from the last roster only breaks ties: scaling the
+                # stage objective above the largest possible distance keeps it first.
+                self.prob.setObjective((cells + 1) * expr + churn)
+                started = time.perf_counter()
+                status, optimal = self._run(staff, warm or index > 0)
+                if status != LpStatusOptimal:
+                    break
+                solution = {var: var.varValue for var in self.prob.variables()}
+                achieved = value(expr) or 0
+                report["stages"].append(
+                    {
+                        "stage": name,
+                        "value": round(achieved, 3),
+                        "optimal": optimal,
+                        "seconds": round(time.perf_counter() - started, 3),
+                    }
+                )
+                if index < len(stages) - 1:
+                    bound = f"stage_{name}"
+                    self.prob.addConstraint(expr <= math.ceil(achieved - 1e-6), bound)
+                    bounds.append(bound)
+        finally:
+            for bound in bounds:
+                del self.prob.constraints[bound]
+        if solution is None:
+            return status, report, status != LpStatusNotSolved
+        # A later stage that ran out of time leaves its own values behind.
+        for var, val in solution.items():
+            var.varValue = val
+        report["terms"] = {name: round(value(expr) or 0, 3) for name, expr in terms.items()}
+        proven = len(report["stages"]) == len(stages) and all(stage["optimal"] for stage in report["stages"])
+        return LpStatusOptimal, report, proven
+
+    def _warm_start(self, staff: StaffTable) -> bool:
+        warm = False
+        for pid, blocked in zip(staff.ids, staff.blocked):
+            previous = self._previous.get(pid, {})
+            warm = warm or bool(previous)
+            for (d, k), var in self._vars[pid].items():
+                var.setInitialValue(0 if d in blocked else previous.get((d, k), 0))
+        return warm
+
+    def _portfolio_variants(self, staff: StaffTable, warm: bool) -> List[Dict]:
+        """Configurations to race: start, symmetry rows, CBC strategy and seeds."""
+        start = None
+        if warm:
+            start = {var.name: var.varValue or 0 for x in self._vars.values() for var in x.values()}
+        variants = [{"name": "warm-start" if warm else "default", "start": start}]
+        if not warm:
+            greedy = _greedy_start(staff)
+            variants.append(
+                {"name": "greedy-start", "start": {self._vars[pid][d, k].name: 1 for pid, d, k in greedy}}
+            )
+        symmetry = self._symmetry_rows(staff)
+        if symmetry:
+            variants.append({"name": "symmetry", "start": start, "constraints": symmetry})
+        variants.append({"name": "aggressive", "start": start, "options": ["strategy", "2"]})
+        seed = 1
+        while len(variants) < _portfolio.size:
+            variants.append(
+                {
+                    "name": f"seed-{seed}",
+                    "start": start,
+                    "options": ["randomCbcSeed", str(seed), "randomSeed", str(seed)],
+                }
+            )
+            seed += 1
+        return variants[: _portfolio.size]
 
-    prob.solve()
-    if prob.status != 1:
-        return {"status": "infeasible", "message": "No feasible roster with current constraints"}
+    def _symmetry_rows(self, staff: StaffTable) -> Dict[str, object]:
+        """Order interchangeable staff by workload so CBC doesn't explore their swaps.
 
-    roster: List[Dict] = []
-    for d in range(DAYS):
-        day_entry = {"day": d + 1, "AM": [], "PM": [], "ND": []}
-        for i, profile in enumerate(profiles):
-            for k, shift in enumerate(SHIFTS):
-                if value(x[i][d][k]) == 1:
-                    day_entry[shift].append(profile["name"])
-        roster.append(day_entry)
+        Staff are interchangeable when every row and objective term they take
+        part in is identical, i.e. same constraint signature and preference
+        and no previous roster pulling them apart.
+        """
+        groups: Dict[Tuple, List[int]] = {}
+        for row, pid in enumerate(staff.ids):
+            if pid in self._previous:
+                continue
+            key = (staff.signature(row), staff.prefs[row])
+            groups.setdefault(key, []).append(pid)
+        rows = {}
+        for members in groups.values():
+            for first, second in zip(members, members[1:]):
+                rows[f"sym_{first}_{second}"] = lpSum(self._vars[first].values()) >= lpSum(
+                    self._vars[second].values()
+                )
+        return rows
+
+    def solve(self, staff: StaffTable) -> Dict:
+        with self._lock:
+            started = time.perf_counter()
+            with _phase("model_patch"):
+                self._sync(staff)
+                warm = self._warm_start(staff)
+            with _phase("cbc"):
+                status, objective, proven = self._optimise(staff, warm)
+            # Only used by incremental solver APIs; don't let it grow per re-solve.
+            self.prob.modifiedConstraints.clear()
+            self.solves += 1
+            self.warm_solves += int(warm)
+            self.last_seconds = time.perf_counter() - started
+            if status == LpStatusNotSolved:
+                return {
+                    "status": "infeasible",
+                    "message": "No feasible roster found within the solve time budget",
+                    "provisional": True,
+                }
+            if status != LpStatusOptimal:
+                return {"status": "infeasible", "message": "No feasible roster with current constraints"}
+
+            assignments = []
+            for pid in staff.ids:
+                chosen = {key: 1 for key, var in self._vars[pid].items() if (value(var) or 0) > 0.5}
+                self._previous[pid] = chosen
+                assignments.append({d: k for d, k in chosen})
+        with _phase("analytics"):
+            result = _roster_result(staff, assignments)
+        result["objective"] = objective
+        # Not proven optimal within the stage time limits; a re-solve may improve it.
+        result["provisional"] = not proven
+        return result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "staff": len(self._vars),
+                "solves": self.solves,
+                "warmSolves": self.warm_solves,
+                "patchedStaff": self.patched,
+                "lastSolveSeconds": round(self.last_seconds, 4),
+            }
+
+
+class ModelSessions:
+    """LRU of ``RosterModel`` sessions keyed by roster scope."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[Tuple, RosterModel]" = OrderedDict()
+
+    def get(self, scope: Tuple) -> RosterModel:
+        with self._lock:
+            session = self._sessions.get(scope)
+            if session is None:
+                session = self._sessions[scope] = RosterModel("Roster")
+            self._sessions.move_to_end(scope)
+            while len(self._sessions) > self.capacity:
+                self._sessions.popitem(last=False)
+            return session
+
+    def stats(self) -> Dict:
+        with self._lock:
+            sessions = list(self._sessions.items())
+        return {
+            "capacity": self.capacity,
+            "sessions": [
+                {"cycle": scope[0], "wards": list(scope[1]), **session.stats()} for scope, session in sessions
+            ],
+        }
 
-    matrix = _build_roster_matrix(roster, staff_names)
-    profile_map = {p["name"]: p for p in profiles}
-    analytics, compliance = _compute_analytics(matrix, profile_map)
+
+_model_sessions = ModelSessions(MODEL_SESSION_LIMIT)
+
+
+def _roster_result(staff: StaffTable, assignments: List[Dict[int, int]]) -> Dict:
+    """Build the API roster payload from per-row ``{day: shift index}`` assignments."""
+    roster: List[Dict] = [{"day": d + 1, "AM": [], "PM": [], "ND": []} for d in range(DAYS)]
+    codes = [["OFF"] * DAYS for _ in assignments]
+    for row, assignment in enumerate(assignments):
+        for d, k in sorted(assignment.items()):
+            roster[d][SHIFTS[k]].append(staff.names[row])
+            codes[row][d] = SHIFT_CODE_MAP[SHIFTS[k]]
+
+    analytics, compliance = _compute_analytics(staff, codes)
 
     return {
         "status": "valid",
         "roster": roster,
+        "codes": codes,
         "analytics": analytics,
         "compliance": compliance,
     }
 
 
-@app.get("/export-excel")
-def export_excel():
-    data = generate_roster()
-    if not isinstance(data, dict):
-        return data
+def _solve_roster(staff: StaffTable) -> Dict:
+    scope = (staff.cycle, tuple(sorted(set(staff.wards))))
+    return _model_sessions.get(scope).solve(staff)
+
+
+def _publishable_roster(cycle: Optional[str] = None, ward: Optional[str] = None) -> Tuple[StaffTable, Dict]:
+    """Return (staff, solved roster), rejecting requests with nothing valid to export."""
+    staff, data = _scope_roster(cycle, ward)
     if data.get("status") != "valid":
         raise HTTPException(400, data.get("message", "Roster not compliant"))
+    return staff, data
+
+
+def _record_publication(staff: StaffTable, data: Dict) -> None:
+    """Keep the published roster for carry-over into the next cycle and for retention.
+
+    Only explicit publications (the Excel export and batch publish) record;
+    CSV and Parquet pulls are read-only.
+    """
+    codes = data["codes"]
+    _roster_history.record(staff.cycle, list(zip(staff.emails, staff.wards, codes)))
+    _roster_archive.record(staff, data, codes)
+
+
+def _roster_export_rows(staff: StaffTable, data: Dict):
+    """Yield one plain row per staff member: identity columns then the day codes."""
+    codes = data["codes"]
+    for row in staff.display_order():
+        yield [staff.wards[row], staff.roles[row], staff.names[row], staff.emails[row], staff.cycles[row], *codes[row]]
+
+
+def _compliance_export_rows(data: Dict):
+    for entry in data.get("analytics", []):
+        yield [
+            entry["name"],
+            entry["role"],
+            entry["fte"],
+            entry["weekendCount"],
+            entry["maxConsecutive"],
+            entry["longestOffStreak"],
+            entry["hasTwoDayBreak"],
+            ", ".join(f"{idx + 1}:{label}" for idx, label in entry["restBreaches"]),
+            entry["fatigueScore"],
+            entry["compliant"],
+            "; ".join(entry["notes"]),
+        ]
+
+
+def _export_table(table: str, staff: StaffTable, data: Dict):
+    if table == "roster":
+        return ROSTER_EXPORT_COLUMNS, _roster_export_rows(staff, data)
+    if table == "compliance":
+        return COMPLIANCE_EXPORT_COLUMNS, _compliance_export_rows(data)
+    raise HTTPException(400, "table must be 'roster' or 'compliance'")
+
+
+class _CsvLine:
+    """File-like sink that hands each formatted CSV line straight back to the caller."""
+
+    def write(self, line: str) -> str:
+        return line
 
-    roster = data["roster"]
-    analytics = data.get("analytics", [])
-    profiles = fetch_profiles()
-    profile_map = {p["name"]: p for p in profiles}
 
-    staff_names = sorted(profile_map.keys(), key=lambda name: (_role_sort_key(profile_map[name]["role"]), name))
-    matrix = _build_roster_matrix(roster, staff_names)
+@app.get("/export-csv")
+def export_csv(table: str = "roster", cycle: Optional[str] = None, ward: Optional[str] = None):
+    staff, data = _publishable_roster(cycle, ward)
+    columns, rows = _export_table(table, staff, data)
+
+    def stream():
+        writer = csv.writer(_CsvLine())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(row)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="roster_{table}.csv"'},
+    )
+
+
+@app.get("/export-parquet")
+def export_parquet(table: str = "roster", cycle: Optional[str] = None, ward: Optional[str] = None):
+    if pa is None:
+        raise HTTPException(501, "Parquet export requires pyarrow to be installed")
+    staff, data = _publishable_roster(cycle, ward)
+    columns, rows = _export_table(table, staff, data)
+
+    key = staff.key
+    body = _shared_results.get_export(key, f"parquet:{table}")
+    if body is None:
+        values = [[] for _ in columns]
+        for row in rows:
+            for column_values, cell in zip(values, row):
+                column_values.append(cell)
+        buffer = io.BytesIO()
+        pq.write_table(pa.table(dict(zip(columns, values))), buffer)
+        body = buffer.getvalue()
+        if not data.get("provisional"):
+            _shared_results.put_export(key, f"parquet:{table}", body)
+    return Response(
+        body,
+        media_type="application/vnd.apache.parquet",
+        headers={"Content-Disposition": f'attachment; filename="roster_{table}.parquet"'},
+    )
+
+
+def _write_roster_sheet(sheet, ward: str, staff: StaffTable, data: Dict) -> None:
+    """Render the styled fortnight grid for one ward onto ``sheet``."""
+    analytics = data.get("analytics", [])
+    order = staff.display_order()
+    codes = data["codes"]
 
     shift_fill = {
         "D": PatternFill("solid", fgColor="FFE4B5"),    # Day: Moccasin (warm orange)
@@ -558,12 +3045,8 @@ def export_excel():
     thick = Side(border_style="medium", color="000000")
     header_band = PatternFill("solid", fgColor="BBD0F7")
 
-    workbook = Workbook()
-    sheet = workbook.active
-    sheet.title = "Published Roster"
-
     sheet.merge_cells("A1:P1")
-    sheet["A1"] = "Published Roster – Ward A – Fortnight"
+    sheet["A1"] = f"Published Roster – {ward} – Fortnight"
     sheet["A1"].font = Font(bold=True, size=16, color="FFFFFF")
     sheet["A1"].alignment = Alignment(horizontal="center", vertical="center")
     sheet["A1"].fill = PatternFill("solid", fgColor="4B0082")
@@ -626,12 +3109,12 @@ def export_excel():
         sheet.column_dimensions[col_week2].width = 11
 
     start_row = 6
-    for row_idx, name in enumerate(staff_names, start=start_row):
-        profile = profile_map[name]
-        row = matrix[name]
-        analytics_entry = next((a for a in analytics if a["name"] == name), None)
+    # Analytics entries follow the same display order as the rows.
+    for row_idx, (staff_row, analytics_entry) in enumerate(zip(order, analytics), start=start_row):
+        name = staff.names[staff_row]
+        row = codes[staff_row]
 
-        sheet[f"A{row_idx}"] = profile["role"]
+        sheet[f"A{row_idx}"] = staff.roles[staff_row]
         sheet[f"A{row_idx}"].alignment = Alignment(horizontal="center", vertical="center")
         sheet[f"A{row_idx}"].border = Border(left=thin, right=thin, top=thin, bottom=thin)
 
@@ -656,45 +3139,8 @@ def export_excel():
             cell.fill = fill
             cell.font = shift_font.get(shift, shift_font["OFF"])  # Apply appropriate font for shift type
 
-    sheet_compliance = workbook.create_sheet("Compliance Summary")
-    sheet_compliance.append(
-        [
-            "Name",
-            "Role",
-            "FTE",
-            "Weekend Shifts",
-            "Max Consecutive",
-            "Longest Off Streak",
-            "Two-Day Break",
-            "Rest Breaches",
-            "Fatigue Score",
-            "Notes",
-        ]
-    )
-
-    for cell in sheet_compliance[1]:
-        cell.font = Font(bold=True)
-        cell.fill = header_band
-        cell.alignment = Alignment(horizontal="center")
-
-    for entry in analytics:
-        sheet_compliance.append(
-            [
-                entry["name"],
-                entry["role"],
-                entry["fte"],
-                entry["weekendCount"],
-                entry["maxConsecutive"],
-                entry["longestOffStreak"],
-                "Yes" if entry["hasTwoDayBreak"] else "No",
-                ", ".join(f"{idx + 1}:{label}" for idx, label in entry["restBreaches"]) or "-",
-                entry["fatigueScore"],
-                "; ".join(entry["notes"]) or "-",
-            ]
-        )
-
     # Add footer with metadata
-    footer_row = max([row for row, name in enumerate(staff_names, start=6)]) + 2
+    footer_row = start_row + len(order) + 1
     sheet.merge_cells(f"A{footer_row}:Q{footer_row}")
     footer_cell = sheet[f"A{footer_row}"]
     footer_cell.value = (
@@ -704,9 +3150,204 @@ def export_excel():
     footer_cell.alignment = Alignment(horizontal="center")
     footer_cell.font = Font(size=9, color="666666", italic=True)
 
-    workbook.save(EXPORT_PATH)
+
+def _write_compliance_sheet(sheet_compliance, sections: List[Tuple[Optional[str], List[Dict]]]) -> None:
+    """Render compliance rows; a leading Ward column is added when sections are ward-tagged."""
+    header_band = PatternFill("solid", fgColor="BBD0F7")
+    header = [
+        "Name",
+        "Role",
+        "FTE",
+        "Weekend Shifts",
+        "Max Consecutive",
+        "Longest Off Streak",
+        "Two-Day Break",
+        "Rest Breaches",
+        "Fatigue Score",
+        "Notes",
+    ]
+    with_ward = any(ward is not None for ward, _ in sections)
+    sheet_compliance.append((["Ward"] if with_ward else []) + header)
+
+    for cell in sheet_compliance[1]:
+        cell.font = Font(bold=True)
+        cell.fill = header_band
+        cell.alignment = Alignment(horizontal="center")
+
+    for ward, analytics in sections:
+        for entry in analytics:
+            sheet_compliance.append(
+                ([ward] if with_ward else [])
+                + [
+                    entry["name"],
+                    entry["role"],
+                    entry["fte"],
+                    entry["weekendCount"],
+                    entry["maxConsecutive"],
+                    entry["longestOffStreak"],
+                    "Yes" if entry["hasTwoDayBreak"] else "No",
+                    ", ".join(f"{idx + 1}:{label}" for idx, label in entry["restBreaches"]) or "-",
+                    entry["fatigueScore"],
+                    "; ".join(entry["notes"]) or "-",
+                ]
+            )
+
+
+@app.get("/export-excel")
+def export_excel(cycle: Optional[str] = None, ward: Optional[str] = None):
+    staff, data = _publishable_roster(cycle, ward)
+    with _phase("record_publication"):
+        _record_publication(staff, data)
+
+    body = _roster_workbook(staff, data)
+
+    # Keep the last export on disk as before.
+    with _phase("write"):
+        _replace_file(EXPORT_PATH, body)
+    return Response(
+        body,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": f'attachment; filename="{EXPORT_FILENAME}"'},
+    )
+
+
+def _roster_workbook(staff: StaffTable, data: Dict) -> bytes:
+    """The published workbook for one roster; rendered once per fingerprint and archived with it."""
+    key = staff.key
+    body = _shared_results.get_export(key, "xlsx")
+    if body is None:
+        with _phase("render"):
+            workbook = Workbook()
+            sheet = workbook.active
+            sheet.title = "Published Roster"
+            _write_roster_sheet(sheet, staff.ward_label(), staff, data)
+            _write_compliance_sheet(workbook.create_sheet("Compliance Summary"), [(None, data.get("analytics", []))])
+            buffer = io.BytesIO()
+            workbook.save(buffer)
+            body = buffer.getvalue()
+        if not data.get("provisional"):
+            _shared_results.put_export(key, "xlsx", body)
+        _roster_archive.attach_workbook(key, body)
+    return body
+
+
+def _replace_file(path: str, body: bytes) -> None:
+    """Write-then-rename so concurrent writers and readers never see a half-written file."""
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as handle:
+        handle.write(body)
+    os.replace(temp_path, path)
+
+
+def _batch_export_path(cycle: str) -> str:
+    safe = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in cycle)
+    stem, ext = os.path.splitext(BATCH_EXPORT_FILENAME)
+    return os.path.join(EXPORT_DIR, f"{stem}_{safe}{ext}")
+
+
+_ward_pool = ThreadPoolExecutor(max_workers=SOLVER_CONCURRENCY, thread_name_prefix="ward-solver")
+
+
+def _solve_ward(cycle: str, ward: str) -> Tuple[Dict, StaffTable, Optional[Dict]]:
+    started = time.monotonic()
+    staff = StaffTable(fetch_profiles(cycle, ward, history=True))
+    outcome = {"ward": ward, "staff": len(staff)}
+    data = None
+    try:
+        data = _roster_for(staff)
+        outcome["status"] = data["status"]
+        if data["status"] != "valid":
+            outcome["message"] = data.get("message", "")
+    except HTTPException as exc:
+        outcome["status"] = "rejected"
+        outcome["message"] = exc.detail
+    outcome["solveSeconds"] = round(time.monotonic() - started, 3)
+    return outcome, staff, data
+
+
+@app.get("/batch-roster")
+def batch_roster(cycle: Optional[str] = None):
+    """Solve every ward of a cycle in parallel and publish one workbook with a sheet per ward."""
+    cycle = _resolve_cycle(cycle)
+    wards = fetch_wards(cycle)
+    if not wards:
+        raise HTTPException(400, "No profiles")
+
+    started = time.monotonic()
+    with _phase("solve"):
+        results = list(_ward_pool.map(_in_request_context(lambda ward: _solve_ward(cycle, ward)), wards))
+
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    sections = []
+    for outcome, staff, data in results:
+        if outcome["status"] != "valid":
+            continue
+        _write_roster_sheet(workbook.create_sheet(outcome["ward"]), outcome["ward"], staff, data)
+        _record_publication(staff, data)
+        # Each ward is archived as its own publication, so it keeps its own workbook too.
+        if not _roster_archive.has_workbook(staff.key):
+            _roster_workbook(staff, data)
+        sections.append((outcome["ward"], data.get("analytics", [])))
+    if sections:
+        _write_compliance_sheet(workbook.create_sheet("Compliance Summary"), sections)
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        _replace_file(_batch_export_path(cycle), buffer.getvalue())
+
+    if len(sections) == len(results):
+        status = "valid"
+    elif sections:
+        status = "partial"
+    else:
+        status = "infeasible"
+    return {
+        "status": status,
+        "cycle": cycle,
+        "wards": [outcome for outcome, _, _ in results],
+        "totalSeconds": round(time.monotonic() - started, 3),
+        "workbook": f"/batch-roster/workbook?cycle={quote(cycle)}" if sections else None,
+    }
+
+
+@app.get("/batch-roster/workbook")
+def batch_roster_workbook(cycle: Optional[str] = None):
+    cycle = _resolve_cycle(cycle)
+    path = _batch_export_path(cycle)
+    if not os.path.exists(path):
+        raise HTTPException(404, "No batch roster has been published for this cycle yet")
     return FileResponse(
-        EXPORT_PATH,
+        path,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        filename=EXPORT_FILENAME,
+        filename=os.path.basename(path),
     )
+
+
+@app.get("/archive/publications")
+def archive_publications(cycle: Optional[str] = None, ward: Optional[str] = None, year: Optional[int] = None):
+    return _roster_archive.publications(cycle, ward, year)
+
+
+@app.get("/archive/publications/{publication_id}")
+def archive_publication(publication_id: int):
+    publication = _roster_archive.publication(publication_id)
+    if publication is None:
+        raise HTTPException(404, "Publication not found")
+    return publication
+
+
+@app.get("/archive/publications/{publication_id}/workbook")
+def archive_workbook(publication_id: int):
+    body = _roster_archive.workbook(publication_id)
+    if body is None:
+        raise HTTPException(404, "No workbook archived for this publication")
+    return Response(
+        body,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": f'attachment; filename="Roster_Archive_{publication_id}.xlsx"'},
+    )
+
+
+@app.get("/archive/shifts")
+def archive_shifts(email: str, year: Optional[int] = None):
+    return _roster_archive.shifts(email.strip(), year)
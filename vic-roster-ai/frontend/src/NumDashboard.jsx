@@ -1,5 +1,5 @@
 import { useEffect, useMemo, useState } from 'react';
-import { fetchProfiles, generateRoster, exportRosterExcel } from './api';
+import { fetchProfiles, subscribeProfileChanges, applyProfileChange, generateRoster, exportRosterExcel } from './api';
 import { ErrorModal } from './ErrorModal';
 
 const ROLE_ORDER = ['ANUM', 'CNS', 'RN', 'EN', 'GNP'];
@@ -31,14 +31,26 @@ export default function NumDashboard() {
   const [apiError, setApiError] = useState(null);
 
   useEffect(() => {
+    // Live submissions arrive over the change feed instead of re-polling /profiles.
+    // Take the snapshot first, then follow the feed from its seq so no change is missed in between.
+    let unsubscribe = () => {};
+    let cancelled = false;
     (async () => {
       const res = await fetchProfiles();
-      if (res.ok) {
-        setProfiles(res.data);
-      } else {
+      if (cancelled) return;
+      if (!res.ok) {
         setApiError(`Failed to load profiles: ${res.error}`);
+        return;
       }
+      setProfiles(res.data);
+      unsubscribe = subscribeProfileChanges((change) => {
+        setProfiles((current) => applyProfileChange(current, change));
+      }, undefined, res.seq);
     })();
+    return () => {
+      cancelled = true;
+      unsubscribe();
+    };
   }, []);
 
   const runAudit = async () => {
@@ -7,6 +7,7 @@ const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
 export const endpoints = {
   profiles: `${API_BASE_URL}/profiles`,
+  profileChanges: `${API_BASE_URL}/profiles/changes`,
   generateRoster: `${API_BASE_URL}/generate-roster`,
   exportExcel: `${API_BASE_URL}/export-excel`,
   submitProfile: `${API_BASE_URL}/submit-profile`,
@@ -45,6 +46,7 @@ export async function apiCall(url, options = {}) {
       ok: true,
       data,
       error: null,
+      headers: response.headers,
     };
   } catch (err) {
     return {
@@ -70,10 +72,42 @@ export async function submitProfile(profile) {
 
 /**
  * Fetch all staff profiles
- * @returns {Promise<{ok: boolean, data: array, error: string|null}>}
+ * @returns {Promise<{ok: boolean, data: array, error: string|null, seq: number}>}
+ *   seq is the change-feed position the snapshot is current to
  */
 export async function fetchProfiles() {
-  return apiCall(endpoints.profiles);
+  const res = await apiCall(endpoints.profiles);
+  return res.ok ? { ...res, seq: Number(res.headers.get('X-Change-Seq')) || 0 } : res;
+}
+
+/**
+ * Subscribe to the server-sent profile change feed instead of re-polling /profiles.
+ * EventSource resumes from the last received seq automatically on reconnect.
+ * @param {function} onChange - Called with {seq, op, profileId, profile} for each insert/update/delete
+ * @param {function} [onError] - Called when the connection drops (it retries by itself)
+ * @param {number} [since] - Replay changes after this seq (e.g. fetchProfiles().seq); defaults to the head
+ * @returns {function} Unsubscribe callback
+ */
+export function subscribeProfileChanges(onChange, onError, since) {
+  const url = since === undefined ? endpoints.profileChanges : `${endpoints.profileChanges}?since=${since}`;
+  const source = new EventSource(url);
+  const handle = (event) => onChange(JSON.parse(event.data));
+  ['insert', 'update', 'delete'].forEach((op) => source.addEventListener(op, handle));
+  if (onError) {
+    source.onerror = onError;
+  }
+  return () => source.close();
+}
+
+/**
+ * Apply one change-feed event to a list of profiles (idempotent upsert/delete by id)
+ * @param {array} profiles - Current profiles
+ * @param {object} change - Change event from subscribeProfileChanges
+ * @returns {array} Updated profiles
+ */
+export function applyProfileChange(profiles, change) {
+  const others = profiles.filter((p) => p.id !== change.profileId);
+  return change.op === 'delete' || !change.profile ? others : [...others, change.profile];
 }
 
 /**
@@ -120,6 +154,8 @@ export default {
   apiCall,
   submitProfile,
   fetchProfiles,
+  subscribeProfileChanges,
+  applyProfileChange,
   generateRoster,
   exportRosterExcel,
 };